@@ -0,0 +1,242 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, request, jsonify, abort, stream_with_context
+
+from models import Venue, Artist, Show
+from queries import (
+  entity_listing,
+  show_rows,
+  encode_cursor,
+  detail_shows,
+  section_shows,
+  listing_filters,
+  show_cursor,
+  SHOWS_PER_PAGE
+)
+from search import search, show_match
+from cache import cached_page, cache_tags
+import loading
+
+# largest page a client may ask for with ?limit=
+API_MAX_PAGE_SIZE = 1000
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def _json_default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  raise TypeError('{!r} is not JSON serializable'.format(value))
+
+def stream_page(items, next_cursor):
+  """Response streaming `{"success", "data", "next_cursor"}` one item at a time.
+
+  `items` is consumed lazily while the body is sent, so a page is never
+  held as one list or one string. `next_cursor` is called once the last
+  item has been written.
+  """
+  def generate():
+    yield '{"success": true, "data": ['
+    for i, item in enumerate(items):
+      yield (',' if i else '') + json.dumps(item, default=_json_default)
+    yield '], "next_cursor": ' + json.dumps(next_cursor()) + '}'
+  return Response(stream_with_context(generate()), mimetype='application/json')
+
+def page_limit():
+  return min(max(request.args.get('limit', SHOWS_PER_PAGE, type=int), 1), API_MAX_PAGE_SIZE)
+
+def stream_rows(rows, limit, item, cursor):
+  """`stream_page` of `limit + 1` rows streamed from the database cursor.
+
+  The extra row only tells that there is a next page; its cursor is
+  `cursor(last row of the page)`. `item` turns a row into its JSON object.
+  """
+  page = {'next_cursor': None}
+
+  def items():
+    last = None
+    for i, row in enumerate(rows):
+      if i == limit:
+        page['next_cursor'] = cursor(last)
+        break
+      last = row
+      yield item(row)
+  return stream_page(items(), lambda: page['next_cursor'])
+
+def entity_json(r):
+  # an entity_listing row
+  return {
+    'id': r.id,
+    'name': r.name,
+    'city': r.city,
+    'state': r.state,
+    'genres': r.genres,
+    'image_link': r.image_link,
+    'num_upcoming_shows': r.upcoming_shows_count,
+    'num_past_shows': r.past_shows_count,
+  }
+
+def entity_page(model, filters):
+  # one keyset page of venues or artists; the cursor is the last id
+  limit = page_limit()
+  rows = entity_listing(model, after=request.args.get('after', None, type=int), limit=limit, **filters)
+  return stream_rows(rows, limit, entity_json, lambda r: str(r.id))
+
+def entity_detail(model, entity_id, columns):
+  entity = loading.query(model, 'detail').filter_by(id=entity_id).first_or_404()
+  shows = detail_shows(model, entity_id)
+  other = 'artist' if model is Venue else 'venue'
+  cache_tags(*[(other, s[other + '_id']) for s in shows['upcoming_shows'] + shows['past_shows']])
+  data = {c.key: getattr(entity, c.key) for c in columns}
+  data['upcoming_shows_count'] = entity.upcoming_shows_count
+  data['past_shows_count'] = entity.past_shows_count
+  data.update(shows)
+  return Response(json.dumps({'success': True, 'data': data}, default=_json_default),
+                  mimetype='application/json')
+
+def entity_shows(model, entity_id, section):
+  # the next page of the upcoming or past shows of entity_detail
+  shows, next_cursor = section_shows(model, entity_id, section, after=show_cursor(), limit=page_limit())
+  other = 'artist' if model is Venue else 'venue'
+  cache_tags(*[(other, s[other + '_id']) for s in shows])
+  return stream_page(shows, lambda: next_cursor)
+
+def entity_search(model):
+  results = search(
+    model,
+    request.args.get('search_term', ''),
+    request.args.get('page', 1, type=int),
+    **listing_filters()
+  )
+  return jsonify({'success': True, **results})
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+@cached_page('venues')
+def venues():
+  return entity_page(Venue, listing_filters())
+
+@api.route('/venues/search')
+def search_venues():
+  return entity_search(Venue)
+
+@api.route('/venues/<int:venue_id>')
+@cached_page(lambda venue_id: [('venue', venue_id)])
+def venue(venue_id):
+  return entity_detail(Venue, venue_id, loading.VENUE_FORM_COLUMNS)
+
+@api.route('/venues/<int:venue_id>/shows/<any(upcoming, past):section>')
+@cached_page(lambda venue_id, section: [('venue', venue_id)])
+def venue_shows(venue_id, section):
+  return entity_shows(Venue, venue_id, section)
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+@api.route('/artists')
+@cached_page('artists')
+def artists():
+  return entity_page(Artist, listing_filters())
+
+@api.route('/artists/search')
+def search_artists():
+  return entity_search(Artist)
+
+@api.route('/artists/<int:artist_id>')
+@cached_page(lambda artist_id: [('artist', artist_id)])
+def artist(artist_id):
+  return entity_detail(Artist, artist_id, loading.ARTIST_FORM_COLUMNS)
+
+@api.route('/artists/<int:artist_id>/shows/<any(upcoming, past):section>')
+@cached_page(lambda artist_id, section: [('artist', artist_id)])
+def artist_shows(artist_id, section):
+  return entity_shows(Artist, artist_id, section)
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+def show_json(s):
+  # a show_rows row
+  return {
+    'id': s.id,
+    'start_time': s.start_time,
+    'venue_id': s.venue_id,
+    'venue_name': s.venue_name,
+    'artist_id': s.artist_id,
+    'artist_name': s.artist_name,
+    'artist_image_link': s.artist_image_link,
+  }
+
+def show_page(match=None):
+  when = request.args.get('when')
+  if when not in (None, 'upcoming', 'past'):
+    abort(400)
+
+  limit = page_limit()
+  rows = show_rows(
+    after=show_cursor(),
+    when=when,
+    venue_id=request.args.get('venue_id', None, type=int),
+    artist_id=request.args.get('artist_id', None, type=int),
+    limit=limit,
+    match=match
+  )
+  return stream_rows(rows, limit, show_json, lambda s: encode_cursor(s.start_time, s.id))
+
+@api.route('/shows')
+@cached_page('shows')
+def shows():
+  return show_page()
+
+@api.route('/shows/search')
+def search_shows():
+  # shows whose venue or artist matches, paginated like the listing
+  return show_page(show_match(request.args.get('search_term', '')))
+
+@api.route('/shows/<int:show_id>')
+def show(show_id):
+  s = loading.query(Show, 'list').get_or_404(show_id)
+  data = {
+    'id': s.id,
+    'start_time': s.start_time,
+    'venue_id': s.venue_id,
+    'venue_name': s.venue.name,
+    'artist_id': s.artist_id,
+    'artist_name': s.artist.name,
+    'artist_image_link': s.artist.image_link,
+  }
+  return Response(json.dumps({'success': True, 'data': data}, default=_json_default),
+                  mimetype='application/json')
+
+#----------------------------------------------------------------------------#
+# Error handlers.
+#----------------------------------------------------------------------------#
+
+@api.errorhandler(400)
+def bad_request(error):
+  return jsonify({
+    'success': False,
+    'error': 400,
+    'message': 'bad request'
+  }), 400
+
+@api.errorhandler(404)
+def not_found(error):
+  return jsonify({
+    'success': False,
+    'error': 404,
+    'message': 'resource not found'
+  }), 404
@@ -5,12 +5,9 @@
 import json
 import sys
 import logging
-from logging import Formatter, FileHandler
 from collections import defaultdict
 from datetime import datetime
 
-import dateutil.parser
-import babel
 from flask import (
     Flask, 
     render_template, 
@@ -20,15 +17,40 @@ from flask import (
     redirect, 
     url_for, 
     jsonify, 
-    abort 
+    abort,
+    stream_with_context,
+    get_flashed_messages
 )
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_wtf import Form
 
-from forms import ShowForm, VenueForm , ArtistForm
-from models import db, Venue, Artist, Show
+from enums import Genre, State
+from forms import ShowForm, VenueForm , ArtistForm, form_errors
+from filters import format_datetime
+from models import db, Venue, Artist, rollover_show_counters, recount_show_counters, delete_with_shows
+from queries import (
+  venue_areas,
+  show_listing,
+  detail_shows,
+  section_shows,
+  filter_listing,
+  genre_facets,
+  listing_filters,
+  show_cursor
+)
+from search import search
+import loading
+from profiler import SQLProfiler
+from bookings import book_show, BookingConflict
+from cache import page_cache, cached_page, cache_tags
+from importer import import_command
+from api import api
+from log_queue import init_queued_logging
+from geo import venue_index
+from availability import availability_index, available_artists
+from assets import Assets
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -39,6 +61,12 @@ app.config.from_object('config')
 moment = Moment(app)
 
 db.init_app(app)
+page_cache.init_app(app)
+venue_index.init_app(app)
+availability_index.init_app(app)
+assets = Assets(app)
+sql_profiler = SQLProfiler(app)
+app.register_blueprint(api)
 
 app.app_context().push()
 
@@ -49,16 +77,32 @@ migrate = Migrate(app, db)
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def stream_template(template_name, **context):
+  # render the template lazily, one chunk at a time, for use with Response.
+  # Flashed messages are popped from the session now, while the session
+  # cookie can still be updated; the layout's get_flashed_messages() call
+  # during streaming gets the same messages from the request context.
+  get_flashed_messages()
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  return template.stream(context)
+
+def invalidate_deleted(affected):
+  # pages of deleted venues/artists, and of the ones that lost shows with them
+  venue_index.discard(*affected['venue'])
+  availability_index.expire()
+  page_cache.invalidate(
+    *[('venue', i) for i in affected['venue']],
+    *[('artist', i) for i in affected['artist']],
+    'venues', 'artists', 'shows'
+  )
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -71,98 +115,70 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cached_page('venues')
 def venues():
-
-  # TODO: replace with real venues data.
-  
-  # old implementation (keeping for future review)
-  # temp = defaultdict(list)
-  # for v in db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).all():
-  #   temp[(v.city, v.state)].append({
-  #     "id": v.id,
-  #     "name": v.name, 
-  #   })
-  # areas = [
-  #   {"city": city, "state": state, "venues": venues}
-  #   for (city, state), venues in temp.items()
-  # ]
-
-  # alternative implementation 
-  areas = []
-  venues = Venue.query.all()
-
-  places = Venue.query.distinct(Venue.city, Venue.state).all()
-
-  for place in places:
-      areas.append({
-          'city': place.city,
-          'state': place.state,
-          'venues': [{
-              'id': venue.id,
-              'name': venue.name,
-              'num_upcoming_shows': len([s for s in venue.shows if s.start_time > datetime.now()])
-          } for venue in venues if
-              venue.city == place.city and venue.state == place.state]
-      })
-  return render_template('pages/venues.html', areas=areas)
-
-@app.route('/venues/search', methods=['POST'])
+  # areas are grouped by the database and streamed to the client as they render
+  filters = listing_filters()
+  return Response(stream_with_context(
+    stream_template('pages/venues.html',
+                    areas=venue_areas(**filters),
+                    facets=genre_facets(Venue, filters['state']),
+                    filters=filters)
+  ))
+
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
   # TODO: implement search on venue with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
 
-  search_term = request.form.get("search_term", "")
-  venues = db.session.query(Venue).filter(Venue.name.ilike(f"%{search_term}%")).all()
-
-  response={
-    "count": len(venues),
-    "data": [
-      { "id": v.id, 
-        "name": v.name, 
-        "num_upcoming_shows": len([s for s in v.shows if s.start_time > datetime.now()])
-      } for v in venues]
-  }
+  search_term = request.values.get("search_term", "")
+  page = request.values.get("page", 1, type=int)
+  filters = listing_filters()
+  response = search(Venue, search_term, page, **filters)
   return render_template('pages/search_venues.html', 
                           results=response, 
-                          search_term=request.form.get('search_term', ''))
+                          search_term=search_term,
+                          filters=filters)
+
+@app.route('/venues/near')
+def venues_near():
+  # the k venues closest to ?lat=&lng=, optionally within ?radius_km=
+  lat = request.args.get('lat', type=float)
+  lng = request.args.get('lng', type=float)
+  k = min(max(request.args.get('k', 10, type=int), 1), app.config['GEO_NEAR_MAX'])
+  radius_km = request.args.get('radius_km', None, type=float)
+  if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+    abort(400)
+
+  hits = venue_index.nearest(lat, lng, k, radius_km)
+  rows = {
+    v.id: v for v in db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state,
+        Venue.latitude, Venue.longitude, Venue.upcoming_shows_count
+      ).filter(Venue.id.in_([venue_id for _, venue_id in hits]))
+  }
+  return jsonify({
+    'success': True,
+    'venues': [{
+      'id': v.id,
+      'name': v.name,
+      'city': v.city,
+      'state': v.state,
+      'latitude': v.latitude,
+      'longitude': v.longitude,
+      'distance_km': round(distance, 3),
+      'num_upcoming_shows': v.upcoming_shows_count,
+    } for distance, v in ((d, rows.get(i)) for d, i in hits) if v is not None]
+  })
 
 @app.route('/venues/<int:venue_id>')
+@cached_page(lambda venue_id: [('venue', venue_id)])
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-
-
-  # v = db.session.query(Venue).get(venue_id)  
-  # shows = db.session.query(Show.start_time, Artist.id, Artist.name, Artist.image_link).\
-  #               join(Artist).\
-  #               filter(Show.venue_id == venue_id).\
-  #               order_by(Show.start_time).\
-  #               all()
-  # def parse_shows(start_time, artist_id, artist_name, artist_image_link):
-  #   return {
-  #     "artist_id": artist_id, 
-  #     "artist_name": artist_name,
-  #     "artist_image_link": artist_image_link,
-  #     "start_time": str(start_time)
-  #   }
-  # upcoming_shows = [parse_shows(*s) for s in shows if s[0] > datetime.now()]
-  # past_shows = [parse_shows(*s) for s in shows if s[0] <= datetime.now()]
-
-  v = Venue.query.get_or_404(venue_id)
-  past_shows = []
-  upcoming_shows = []
-  for show in v.shows:
-    info = {
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name, 
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-    }
-    if show.start_time <= datetime.now():
-      past_shows.append(info)
-    else:
-      upcoming_shows.append(info)
+  v = loading.query(Venue, 'detail').filter_by(id=venue_id).first_or_404()
+  shows = detail_shows(Venue, venue_id)
+  cache_tags(*[('artist', s['artist_id']) for s in shows['upcoming_shows'] + shows['past_shows']])
 
   data = {
     "id": v.id,
@@ -177,13 +193,22 @@ def show_venue(venue_id):
     "seeking_talent": v.seeking_talent,
     "seeking_description": v.seeking_description,
     "image_link": v.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
+    "upcoming_shows_count": v.upcoming_shows_count,
+    "past_shows_count": v.past_shows_count,
+    **shows
   }
   return render_template('pages/show_venue.html', venue=data)
 
+@app.route('/venues/<int:venue_id>/shows/<any(upcoming, past):section>')
+@cached_page(lambda venue_id, section: [('venue', venue_id)])
+def venue_shows(venue_id, section):
+  # the next page of a section of the venue page, fetched by its "Load more"
+  shows, next_cursor = section_shows(Venue, venue_id, section, after=show_cursor())
+  cache_tags(*[('artist', s['artist_id']) for s in shows])
+  return render_template('pages/show_tiles.html', shows=shows, other='artist',
+                         next_url=next_cursor and url_for('venue_shows', venue_id=venue_id,
+                                                          section=section, after=next_cursor))
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
@@ -207,6 +232,8 @@ def create_venue_submission():
       form.populate_obj(venue)
       db.session.add(venue)
       db.session.commit()
+      page_cache.invalidate('venues')
+      venue_index.upsert(venue.id, form.latitude.data, form.longitude.data)
       flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except ValueError as e:
       print(e)
@@ -215,10 +242,7 @@ def create_venue_submission():
     finally:
       db.session.close()
   else:
-    err_msg = []
-    for field, err in form.errors.items():
-      err_msg.append(field + '-' + '|'.join(err))
-    flash('Errors: ' + str(err_msg))
+    flash('Errors: ' + str(form_errors(form)))
 
   return render_template('pages/home.html')
  
@@ -252,9 +276,10 @@ def delete_venue(venue_id):
   # TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   try:
-    venue = Venue.query.get(venue_id)
-    db.session.delete(venue)
+    # shows are removed by the database, see delete_with_shows
+    affected = delete_with_shows(Venue, [int(venue_id)])
     db.session.commit()
+    invalidate_deleted(affected)
   except:
     db.session.rollback()
   finally:
@@ -264,6 +289,40 @@ def delete_venue(venue_id):
   # clicking that button delete it from the db then redirect the user to the homepage
   return ('', 200)
 
+@app.route('/<any(venues, artists):entity>/delete', methods=['POST'])
+def bulk_delete(entity):
+  # deletes many venues or artists, with their shows, in one statement;
+  # ids come as a JSON list {"ids": [...]} or as repeated `ids` form fields
+  model = Venue if entity == 'venues' else Artist
+  try:
+    if request.is_json:
+      ids = request.get_json()['ids']
+    else:
+      ids = [int(i) for i in request.form.getlist('ids')]
+  except (LookupError, TypeError, ValueError):
+    abort(400)
+  # only a list of integers: a string would be taken apart into its digits,
+  # and bools are ints to Python
+  if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+    abort(400)
+  ids = sorted(set(ids))
+  if not ids or len(ids) > app.config['BULK_DELETE_MAX']:
+    abort(400)
+
+  try:
+    affected = delete_with_shows(model, ids)
+    db.session.commit()
+  except:
+    db.session.rollback()
+    abort(500)
+  finally:
+    db.session.close()
+  invalidate_deleted(affected)
+  return jsonify({
+    'success': True,
+    'deleted': affected[model.__tablename__]
+  })
+
 
 #  Update Venue
 #  ----------------------------------------------------------------
@@ -271,7 +330,7 @@ def delete_venue(venue_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   # TODO: populate form with values from venue with ID <venue_id>
-  venue = Venue.query.get_or_404(venue_id)
+  venue = loading.query(Venue, 'edit').get_or_404(venue_id)
   form = VenueForm(obj=venue)
 
   return render_template('forms/edit_venue.html', form=form, venue=venue)
@@ -283,10 +342,12 @@ def edit_venue_submission(venue_id):
   form = VenueForm(request.form, meta = {'csrf': False})
   if form.validate():
     try:
-      venue = Venue.query.get_or_404(venue_id)
+      venue = loading.query(Venue, 'edit').get_or_404(venue_id)
       form.populate_obj(venue)
       db.session.add(venue)
       db.session.commit()
+      page_cache.invalidate(('venue', venue_id), 'venues', 'artists', 'shows')
+      venue_index.upsert(venue_id, form.latitude.data, form.longitude.data)
       flash('Venue update success!')
     except ValueError as e:
       print(e)
@@ -295,73 +356,65 @@ def edit_venue_submission(venue_id):
     finally:
       db.session.close()
   else:
-    err_msg = []
-    for field, err in form.errors.items():
-      err_msg.append(field + '-' + '|'.join(err))
-    flash('Errors: ' + str(err_msg))
+    flash('Errors: ' + str(form_errors(form)))
 
   return redirect(url_for('show_venue', venue_id=venue_id))
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@cached_page('artists')
 def artists():
   # TODO: replace with real data returned from querying the database
-  data = db.session.query(Artist).all()
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  filters = listing_filters()
+  data = filter_listing(loading.query(Artist, 'list'), Artist, **filters).all()
+  return render_template('pages/artists.html',
+                         artists=data,
+                         facets=genre_facets(Artist, filters['state']),
+                         filters=filters)
+
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  search_term = request.form.get("search_term", "")
-  data = db.session.query(Artist).filter(Artist.name.ilike(f"%{search_term}%")).all()
-
-  response={
-    "count": len(data),
-    "data": [{
-      "id": d.id,
-      "name": d.name,
-      "num_upcoming_shows": len([s for s in d.shows if s.start_time > datetime.now()]),
-    } for d in data]
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term = request.values.get("search_term", "")
+  page = request.values.get("page", 1, type=int)
+  filters = listing_filters()
+  response = search(Artist, search_term, page, **filters)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, filters=filters)
+
+@app.route('/artists/available')
+def artists_available():
+  # seeking artists with no show on ?date=YYYY-MM-DD, narrowed by ?genre= / ?state=
+  filters = listing_filters()
+  try:
+    day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+  except ValueError:
+    abort(400)
+  if day < datetime.now().date():
+    # only shows that haven't ended are kept in the calendars
+    abort(400)
+
+  return jsonify({
+    'success': True,
+    'date': day.isoformat(),
+    'artists': [{
+      'id': a.id,
+      'name': a.name,
+      'city': a.city,
+      'state': a.state,
+      'image_link': a.image_link,
+    } for a in available_artists(day, **filters)]
+  })
 
 @app.route('/artists/<int:artist_id>')
+@cached_page(lambda artist_id: [('artist', artist_id)])
 def show_artist(artist_id):
   # shows the artist page with the given artist_id
-  # TODO: replace with real artist data from the artist table, using artist_id
-  # artist = db.session.query(Artist).get(artist_id)
-  # shows = db.session.query(Show.start_time, Venue.id, Venue.name, Venue.image_link).\
-  #               join(Venue).\
-  #               filter(Show.artist_id == artist_id).\
-  #               order_by(Show.start_time).\
-  #               all()
-  # def parse_shows(start_time, venue_id, venue_name, venue_image_link):
-  #   return {
-  #     "venue_id": venue_id, 
-  #     "venue_name": venue_name,
-  #     "venue_image_link": venue_image_link,
-  #     "start_time": str(start_time)
-  #   }
-  # upcoming_shows = [parse_shows(*s) for s in shows if s[0] > datetime.now()]
-  # past_shows = [parse_shows(*s) for s in shows if s[0] <= datetime.now()]
-
-  artist = Artist.query.get_or_404(artist_id)
-  past_shows = []
-  upcoming_shows = []
-  for show in artist.shows:
-    info = {
-      "venue_id": show.venue_id, 
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link, 
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-    }
-    if show.start_time <= datetime.now():
-      past_shows.append(info)
-    else:
-      upcoming_shows.append(info)
+  artist = loading.query(Artist, 'detail').filter_by(id=artist_id).first_or_404()
+  shows = detail_shows(Artist, artist_id)
+  cache_tags(*[('venue', s['venue_id']) for s in shows['upcoming_shows'] + shows['past_shows']])
 
   data = {
     "id": artist.id,
@@ -375,14 +428,23 @@ def show_artist(artist_id):
     "seeking_venue": artist.seeking_venue,
     "seeking_description": artist.seeking_description,
     "image_link": artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
+    "upcoming_shows_count": artist.upcoming_shows_count,
+    "past_shows_count": artist.past_shows_count,
+    **shows
   }
   
   return render_template('pages/show_artist.html', artist=data)
 
+@app.route('/artists/<int:artist_id>/shows/<any(upcoming, past):section>')
+@cached_page(lambda artist_id, section: [('artist', artist_id)])
+def artist_shows(artist_id, section):
+  # the next page of a section of the artist page, fetched by its "Load more"
+  shows, next_cursor = section_shows(Artist, artist_id, section, after=show_cursor())
+  cache_tags(*[('venue', s['venue_id']) for s in shows])
+  return render_template('pages/show_tiles.html', shows=shows, other='venue',
+                         next_url=next_cursor and url_for('artist_shows', artist_id=artist_id,
+                                                          section=section, after=next_cursor))
+
 
 #  Create Artist
 #  ----------------------------------------------------------------
@@ -407,6 +469,7 @@ def create_artist_submission():
       form.populate_obj(artist)
       db.session.add(artist)
       db.session.commit()
+      page_cache.invalidate('artists')
       flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except ValueError as e:
       print(e)
@@ -415,10 +478,7 @@ def create_artist_submission():
     finally:
       db.session.close()
   else:
-    err_msg = []
-    for field, err in form.errors.items():
-      err_msg.append(field + '-' + '|'.join(err))
-    flash('Errors: ' + str(err_msg))
+    flash('Errors: ' + str(form_errors(form)))
 
   return render_template('pages/home.html')
 
@@ -429,7 +489,7 @@ def create_artist_submission():
 def edit_artist(artist_id):
   # TODO: populate form with fields from artist with ID <artist_id>
   
-  artist = Artist.query.get_or_404(artist_id)
+  artist = loading.query(Artist, 'edit').get_or_404(artist_id)
   form = ArtistForm(obj=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -440,10 +500,11 @@ def edit_artist_submission(artist_id):
   form = ArtistForm(request.form, meta = {'csrf': False})
   if form.validate():
     try:
-      artist = Artist.query.get_or_404(artist_id)
+      artist = loading.query(Artist, 'edit').get_or_404(artist_id)
       form.populate_obj(artist)
       db.session.add(artist)
       db.session.commit()
+      page_cache.invalidate(('artist', artist_id), 'venues', 'artists', 'shows')
       flash('Update success!')
     except ValueError as e:
       print(e)
@@ -452,10 +513,7 @@ def edit_artist_submission(artist_id):
     finally:
       db.session.close()
   else:
-    err_msg = []
-    for field, err in form.errors.items():
-      err_msg.append(field + '-' + '|'.join(err))
-    flash('Field error: ' + str(err_msg))
+    flash('Field error: ' + str(form_errors(form)))
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
@@ -464,21 +522,26 @@ def edit_artist_submission(artist_id):
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cached_page('shows')
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  
-  shows = Show.query.order_by('start_time').all()
+  # displays list of shows at /shows, one page at a time
+  when = request.args.get('when')
+  if when not in (None, 'upcoming', 'past'):
+    abort(400)
+  venue_id = request.args.get('venue_id', None, type=int)
+  artist_id = request.args.get('artist_id', None, type=int)
+
+  rows, next_cursor = show_listing(after=show_cursor(), when=when, venue_id=venue_id, artist_id=artist_id)
   data = [{
-    "venue_id": s.venue.id,
-    "venue_name": s.venue.name,
-    "artist_id": s.artist.id,
-    "artist_name": s.artist.name,
-    "artist_image_link": s.artist.image_link,
-    "start_time": s.start_time.strftime("%m/%d/%Y, %H:%M")
-  } for s in shows]
-  return render_template('pages/shows.html', shows=data)
+    "venue_id": s.venue_id,
+    "venue_name": s.venue_name,
+    "artist_id": s.artist_id,
+    "artist_name": s.artist_name,
+    "artist_image_link": s.artist_image_link,
+    "start_time": s.start_time
+  } for s in rows]
+  filters = {'when': when, 'venue_id': venue_id, 'artist_id': artist_id}
+  return render_template('pages/shows.html', shows=data, filters=filters, next_cursor=next_cursor)
 
 @app.route('/shows/create')
 def create_shows():
@@ -498,11 +561,16 @@ def create_show_submission():
 
   if form.validate():
     try:
-      show = Show()
-      form.populate_obj(show)
-      db.session.add(show)
+      venue_id, artist_id = int(form.venue_id.data), int(form.artist_id.data)
+      book_show(venue_id, artist_id, form.start_time.data, app.config['SHOW_DURATION_MINUTES'])
       db.session.commit()
+      page_cache.invalidate(('venue', venue_id), ('artist', artist_id), 'venues', 'artists', 'shows')
+      availability_index.book(artist_id, form.start_time.data)
       flash('Show was successfully listed!')
+    except BookingConflict as e:
+      db.session.rollback()
+      flash('Show could not be listed: the venue or the artist is already booked at ' +
+            ', '.join(format_datetime(c.start_time, 'full') for c in e.conflicts) + '.')
     except ValueError as e:
       print(e)
       flash('Error in listing show. Please try again.')
@@ -510,14 +578,54 @@ def create_show_submission():
     finally:
       db.session.close()
   else:
-    err_msg = []
-    for field, err in form.errors.items():
-      err_msg.append(field + '-' + '|'.join(err))
-    flash('Errors: ' + str(err_msg))
+    flash('Errors: ' + str(form_errors(form)))
 
   return render_template('pages/home.html')
 
 
+#  Genres
+#  ----------------------------------------------------------------
+
+@app.route('/genres/facets')
+def genres_facets():
+  # per-genre venue or artist counts for the browse sidebar
+  model = {'venues': Venue, 'artists': Artist}.get(request.args.get('entity', 'venues'))
+  state = request.args.get('state') or None
+  if model is None or (state is not None and state not in State.__members__):
+    abort(400)
+  return jsonify({
+    'success': True,
+    'facets': genre_facets(model, state)
+  })
+
+
+#  Cache
+#  ----------------------------------------------------------------
+
+def cache_stats():
+  return jsonify(page_cache.stats())
+
+# internal numbers; only served in debug mode or when explicitly enabled
+if app.debug or app.config.get('CACHE_STATS_ENDPOINT', False):
+  app.add_url_rule('/cache/stats', 'cache_stats', cache_stats)
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('rollover-shows')
+def rollover_shows_command():
+  """Move shows that have started from the upcoming to the past counters."""
+  rollover_show_counters()
+
+app.cli.add_command(import_command)
+
+@app.cli.command('recount-shows')
+def recount_shows_command():
+  """Rebuild the venue and artist show counters from the show table."""
+  recount_show_counters()
+
+
 #  Error Routes
 #  ----------------------------------------------------------------
 
@@ -531,13 +639,8 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    # records are queued and written by a background thread (see log_queue.py)
+    log_handler = init_queued_logging(app)
     app.logger.info('errors')
 
 #----------------------------------------------------------------------------#
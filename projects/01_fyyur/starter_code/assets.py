@@ -0,0 +1,170 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import mimetypes
+import posixpath
+
+import click
+from flask import request, send_from_directory, current_app
+from flask.cli import with_appcontext
+
+try:
+  import brotli
+except ImportError:  # optional; only gzip variants are built without it
+  brotli = None
+
+#----------------------------------------------------------------------------#
+# Build
+#----------------------------------------------------------------------------#
+
+# fingerprinted files, and the ones worth compressing (woff is compressed already)
+ASSET_EXTENSIONS = ('.css', '.js', '.eot', '.otf', '.svg', '.ttf', '.woff', '.woff2')
+COMPRESS_EXTENSIONS = ('.css', '.js', '.eot', '.otf', '.svg', '.ttf')
+
+MANIFEST = 'manifest.json'
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")?#]+)([^'")]*)\1\s*\)''')
+
+def fingerprint(path, digest):
+  root, ext = os.path.splitext(path)
+  return '{}.{}{}'.format(root, digest[:12], ext)
+
+def _rewrite_css(css, css_path, manifest):
+  # point url(...) references at the fingerprinted files
+  directory = posixpath.dirname(css_path)
+
+  def replace(match):
+    quote, target, suffix = match.groups()
+    if re.match(r'^[a-z]+:|^/', target):
+      return match.group(0)
+    resolved = posixpath.normpath(posixpath.join(directory, target))
+    if resolved not in manifest:
+      return match.group(0)
+    hashed = posixpath.relpath(manifest[resolved], directory)
+    return 'url({0}{1}{2}{0})'.format(quote, hashed, suffix)
+
+  return _CSS_URL.sub(replace, css)
+
+def build_assets(static_folder, build_dir):
+  """Copy every asset to `build_dir` under a content-hashed name.
+
+  Fonts and scripts are hashed first so stylesheets can be rewritten to
+  reference their hashed names before being hashed themselves. Each
+  compressible file also gets .gz (and, with the `brotli` package, .br)
+  siblings. Returns the manifest mapping original to hashed paths, which
+  is also written to `build_dir`/manifest.json.
+  """
+  sources = []
+  for directory, dirnames, filenames in os.walk(static_folder):
+    if os.path.abspath(directory).startswith(os.path.abspath(build_dir)):
+      continue
+    for filename in filenames:
+      if filename.endswith(ASSET_EXTENSIONS):
+        path = os.path.join(directory, filename)
+        sources.append(os.path.relpath(path, static_folder).replace(os.sep, '/'))
+  sources.sort(key=lambda p: (p.endswith('.css'), p))
+
+  if os.path.isdir(build_dir):
+    shutil.rmtree(build_dir)
+  manifest = {}
+  for source in sources:
+    with open(os.path.join(static_folder, source), 'rb') as f:
+      content = f.read()
+    if source.endswith('.css'):
+      content = _rewrite_css(content.decode('utf-8'), source, manifest).encode('utf-8')
+    hashed = fingerprint(source, hashlib.sha256(content).hexdigest())
+    manifest[source] = hashed
+
+    target = os.path.join(build_dir, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+      f.write(content)
+    if source.endswith(COMPRESS_EXTENSIONS):
+      with open(target + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, 9))
+      if brotli is not None:
+        with open(target + '.br', 'wb') as f:
+          f.write(brotli.compress(content))
+
+  with open(os.path.join(build_dir, MANIFEST), 'w') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  return manifest
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+  """Fingerprint and precompress the static CSS, JS and font files."""
+  assets = current_app.extensions['assets']
+  manifest = build_assets(current_app.static_folder, assets.build_dir)
+  click.echo('Built {} assets in {}'.format(len(manifest), assets.build_dir))
+  assets.load_manifest()
+
+#----------------------------------------------------------------------------#
+# Runtime
+#----------------------------------------------------------------------------#
+
+class Assets(object):
+  """Serve the assets built by `flask build-assets`.
+
+  `url_for('static', filename='css/main.css')` is rewritten to the hashed
+  name from the manifest, and hashed files are sent with far-future
+  immutable cache headers, precompressed when the client accepts br or
+  gzip. Without a manifest (nothing built yet) static files are served as
+  usual.
+  """
+
+  def __init__(self, app=None):
+    self.manifest = {}
+    self.build_dir = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.prefix = app.config.get('ASSETS_BUILD_PREFIX', 'build')
+    self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    self.build_dir = os.path.join(app.static_folder, self.prefix)
+    self.load_manifest()
+
+    app.extensions['assets'] = self
+    app.url_defaults(self._hashed_url)
+    app.view_functions['static'] = self.send_static_file
+    app.cli.add_command(build_assets_command)
+
+  def load_manifest(self):
+    try:
+      with open(os.path.join(self.build_dir, MANIFEST)) as f:
+        self.manifest = json.load(f)
+    except FileNotFoundError:
+      self.manifest = {}
+
+  def _hashed_url(self, endpoint, values):
+    if endpoint == 'static' and values.get('filename') in self.manifest:
+      values['filename'] = self.prefix + '/' + self.manifest[values['filename']]
+
+  def send_static_file(self, filename):
+    if not filename.startswith(self.prefix + '/'):
+      return current_app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+      if request.accept_encodings[candidate] > 0 and \
+          os.path.isfile(os.path.join(current_app.static_folder, filename + suffix)):
+        encoding = candidate
+        filename += suffix
+        break
+
+    response = send_from_directory(current_app.static_folder, filename,
+                                   mimetype=mimetype, cache_timeout=self.max_age)
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(self.max_age)
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+      response.headers['Content-Encoding'] = encoding
+    return response
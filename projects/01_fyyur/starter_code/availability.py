@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from models import db, Artist, Show
+from queries import filter_listing
+
+#----------------------------------------------------------------------------#
+# Booked intervals
+#----------------------------------------------------------------------------#
+
+class Calendar(object):
+  """Booked time of one artist as sorted, merged [start, end) intervals.
+
+  Overlapping or touching bookings are merged on insert, so the two lists
+  stay as short as the artist's schedule is fragmented, and both are
+  sorted, so lookups are binary searches.
+  """
+  __slots__ = ('starts', 'ends')
+
+  def __init__(self):
+    self.starts = []
+    self.ends = []
+
+  def book(self, start, end):
+    i = bisect_left(self.ends, start)   # first interval ending at or after start
+    j = bisect_right(self.starts, end)  # past the last one starting at or before end
+    if i < j:
+      start = min(start, self.starts[i])
+      end = max(end, self.ends[j - 1])
+    self.starts[i:j] = [start]
+    self.ends[i:j] = [end]
+
+  def is_free(self, start, end):
+    # the first interval ending after `start` must begin at or after `end`
+    i = bisect_right(self.ends, start)
+    return i == len(self.starts) or self.starts[i] >= end
+
+#----------------------------------------------------------------------------#
+# Availability index
+#----------------------------------------------------------------------------#
+
+class AvailabilityIndex(object):
+  """Per-artist calendars of upcoming bookings, kept in memory.
+
+  Loaded from the show table on first use, with one streamed query over
+  the shows that haven't ended yet. Routes add new shows with `book` after
+  each commit. Deletes call `expire`, and the index is reloaded every `ttl`
+  seconds, to pick up shows written by other processes or outside the app.
+  """
+
+  def __init__(self, duration_minutes=180, ttl=300):
+    self.duration = timedelta(minutes=duration_minutes)
+    self.ttl = ttl
+    self.loaded_at = None
+    self._calendars = {}
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    self.__init__(app.config.get('SHOW_DURATION_MINUTES', 180),
+                  app.config.get('AVAILABILITY_TTL', self.ttl))
+
+  def load(self, now=None):
+    now = now or datetime.now()
+    shows = db.session.query(Show.artist_id, Show.start_time).\
+      filter(Show.start_time > now - self.duration).\
+      order_by(Show.artist_id, Show.start_time).\
+      yield_per(10000)
+    calendars = {}
+    for artist_id, start_time in shows:
+      calendar = calendars.get(artist_id)
+      if calendar is None:
+        calendar = calendars[artist_id] = Calendar()
+      calendar.book(start_time, start_time + self.duration)
+    with self._lock:
+      self._calendars = calendars
+      self.loaded_at = time.monotonic()
+
+  def expire(self):
+    self.loaded_at = None
+
+  def _ensure_loaded(self):
+    if self.loaded_at is None or (self.ttl and time.monotonic() - self.loaded_at > self.ttl):
+      self.load()
+
+  def book(self, artist_id, start_time):
+    if self.loaded_at is None:
+      return  # the first load will read it from the database
+    with self._lock:
+      calendar = self._calendars.setdefault(artist_id, Calendar())
+      calendar.book(start_time, start_time + self.duration)
+
+  def free(self, artist_ids, start, end):
+    """The ids among `artist_ids` with no show overlapping [start, end)."""
+    self._ensure_loaded()
+    with self._lock:
+      calendars = self._calendars
+      return [
+        i for i in artist_ids
+        if i not in calendars or calendars[i].is_free(start, end)
+      ]
+
+availability_index = AvailabilityIndex()
+
+def available_artists(day, genre=None, state=None):
+  """Seeking artists, of `genre` and in `state` if given, with no show on `day`.
+
+  The candidates come from the artist table (the genres GIN index narrows
+  them); the show table isn't read, the calendars answer for the day.
+  """
+  start = datetime.combine(day, datetime.min.time())
+  end = start + timedelta(days=1)
+  candidates = db.session.query(
+      Artist.id, Artist.name, Artist.city, Artist.state, Artist.image_link
+    ).\
+    filter(Artist.seeking_venue.is_(True))
+  candidates = filter_listing(candidates, Artist, genre, state).\
+    order_by(Artist.name, Artist.id).\
+    all()
+
+  free = set(availability_index.free([a.id for a in candidates], start, end))
+  return [a for a in candidates if a.id in free]
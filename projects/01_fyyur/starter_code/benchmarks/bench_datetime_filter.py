@@ -0,0 +1,55 @@
+"""Micro-benchmark of the Jinja `datetime` filter.
+
+Compares the original implementation (parse every value with dateutil,
+resolve the Babel pattern and locale on every call) with `filters.py`.
+
+    python benchmarks/bench_datetime_filter.py [--number N]
+"""
+import os
+import sys
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+import dateutil.parser
+import babel.dates
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--number', type=int, default=20000, help='calls per case')
+  args = parser.parse_args()
+
+  # a listing page worth of show times, with the repeats real listings have
+  start = datetime(2021, 6, 1, 20, 0)
+  times = [start + timedelta(days=i % 90, hours=i % 4) for i in range(args.number)]
+  strings = [t.strftime("%m/%d/%Y, %H:%M") for t in times]
+  assert all(legacy_format_datetime(s, 'full') == format_datetime(t, 'full')
+             for s, t in zip(strings[:100], times[:100]))
+
+  cases = [
+    ('legacy, string input', lambda: [legacy_format_datetime(s, 'full') for s in strings]),
+    ('new, string input', lambda: [format_datetime(s, 'full') for s in strings]),
+    ('new, datetime input', lambda: [format_datetime(t, 'full') for t in times]),
+  ]
+  print('{:<24} {:>12}'.format('case', 'us/call'))
+  for name, run in cases:
+    seconds = min(timeit.repeat(run, number=1, repeat=3))
+    print('{:<24} {:>12.2f}'.format(name, seconds / args.number * 1e6))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,86 @@
+"""Validations per second of the fyyur forms.
+
+Compares building a new form for every record (what the submission
+handlers do for a single request) with `forms.RecordValidator`, which
+re-processes one form instance per batch (bulk imports, API payloads).
+Records are a seeded mix of valid and invalid venues, artists and shows:
+
+    python benchmarks/bench_forms.py --records 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+from forms import VenueForm, ArtistForm, ShowForm, RecordValidator
+
+
+def venue_records(rng, count):
+  for row in synthetic.venue_rows(rng, count):
+    if rng.random() < 0.1:
+      row['phone'] = 'not a phone'
+    if rng.random() < 0.05:
+      row['genres'] = ['NOT_A_GENRE']
+    yield row
+
+
+def artist_records(rng, count):
+  for row in synthetic.artist_rows(rng, count):
+    if rng.random() < 0.1:
+      row['state'] = 'XX'
+    yield row
+
+
+def show_records(rng, count):
+  now = datetime.now()
+  for row in synthetic.show_rows(rng, count, 1000, 1000, now):
+    row['start_time'] = row['start_time'].strftime('%Y-%m-%d %H:%M:%S')
+    if rng.random() < 0.1:
+      row['start_time'] = 'tomorrow-ish'
+    yield row
+
+
+def per_record(form_class, records):
+  validator = RecordValidator(form_class)  # only for its dict -> formdata conversion
+  valid = 0
+  for record in records:
+    form = form_class(formdata=validator.formdata(record), meta={'csrf': False})
+    valid += form.validate()
+  return valid
+
+
+def batched(form_class, records):
+  return sum(errors is None for _, errors in RecordValidator(form_class).validate_many(records))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--records', type=int, default=20000, help='records per form')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  # Flask-WTF forms read the app config, they don't need a database
+  Flask(__name__).app_context().push()
+
+  for name, form_class, generate in (
+      ('venue', VenueForm, venue_records),
+      ('artist', ArtistForm, artist_records),
+      ('show', ShowForm, show_records)):
+    records = list(generate(random.Random(args.seed), args.records))
+    for mode, run in (('per-record', per_record), ('batched', batched)):
+      started = time.perf_counter()
+      valid = run(form_class, records)
+      elapsed = time.perf_counter() - started
+      print('{:<7} {:<11} {:>9.0f} validations/s  ({} of {} valid)'.format(
+        name, mode, len(records) / elapsed, valid, len(records)))
+
+
+if __name__ == '__main__':
+  main()
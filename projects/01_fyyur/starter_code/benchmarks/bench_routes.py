@@ -0,0 +1,249 @@
+"""Scale benchmark of every fyyur route.
+
+For each scale the database is rebuilt with `synthetic.generate` and each
+route is requested through the Flask test client, with the page cache
+cleared before every request. Latency percentiles and SQL statement counts
+are printed and written as JSON so runs can be compared between commits.
+
+THIS DROPS ALL TABLES of the database it is pointed at; use a scratch one:
+
+    python benchmarks/bench_routes.py \
+        --database postgresql://localhost:5432/fyyur_bench \
+        --scales 1000,100000,1000000 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+from cache import page_cache
+from geo import venue_index
+from models import Venue
+
+
+def percentile(samples, p):
+  ordered = sorted(samples)
+  return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def git_revision():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def venue_form(i):
+  return {
+    'name': 'Bench Venue {}'.format(i),
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1 Bench Street',
+    'phone': '415-000-1234',
+    'genres': ['JAZZ', 'BLUES'],
+    'facebook_link': '',
+    'website': '',
+    'image_link': '',
+    'seeking_description': '',
+  }
+
+
+def artist_form(i):
+  return {
+    'name': 'Bench Artist {}'.format(i),
+    'city': 'San Francisco',
+    'state': 'CA',
+    'phone': '415-000-1234',
+    'genres': ['JAZZ'],
+    'facebook_link': '',
+    'website': '',
+    'image_link': '',
+    'seeking_description': '',
+  }
+
+
+def routes(scale, rng):
+  """(endpoint, method, url factory, form data factory) for every route."""
+  def some_id():
+    # favour the busy low ids, like real traffic does
+    return int(scale ** rng.random())
+
+  def near():
+    lat, lng = synthetic.CITY_COORDINATES[rng.choice(synthetic.CITIES)[0]]
+    return lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)
+
+  def future():
+    return (datetime.now() + timedelta(days=rng.randint(1, 365))).strftime('%Y-%m-%d %H:%M:%S')
+
+  def new_venue_id(client):
+    # deletes a venue created for the purpose, so the catalogue keeps its shape
+    client.post('/venues/create', data=venue_form(rng.randint(0, 10 ** 9)))
+    return synthetic.db.session.query(func.max(Venue.id)).scalar()
+
+  created = []
+
+  def bulk_delete_url(client):
+    del created[:]
+    created.extend(new_venue_id(client) for _ in range(2))
+    return '/venues/delete'
+
+  def section():
+    return rng.choice(['upcoming', 'past'])
+
+  def term():
+    return rng.choice(synthetic.NAME_WORDS)
+
+  return [
+    ('index', 'GET', lambda c: '/', None),
+    ('venues', 'GET', lambda c: '/venues', None),
+    ('venues_near', 'GET', lambda c: '/venues/near?lat={:.4f}&lng={:.4f}'.format(*near()), None),
+    ('search_venues', 'POST', lambda c: '/venues/search', lambda: {'search_term': term()}),
+    ('show_venue', 'GET', lambda c: '/venues/{}'.format(some_id()), None),
+    ('venue_shows', 'GET', lambda c: '/venues/{}/shows/{}'.format(some_id(), section()), None),
+    ('create_venue_form', 'GET', lambda c: '/venues/create', None),
+    ('create_venue_submission', 'POST', lambda c: '/venues/create', lambda: venue_form(rng.randint(0, 10 ** 9))),
+    ('edit_venue', 'GET', lambda c: '/venues/{}/edit'.format(some_id()), None),
+    ('edit_venue_submission', 'POST', lambda c: '/venues/{}/edit'.format(some_id()), lambda: venue_form(rng.randint(0, 10 ** 9))),
+    ('delete_venue', 'DELETE', lambda c: '/venues/{}'.format(new_venue_id(c)), None),
+    ('bulk_delete', 'POST', bulk_delete_url, lambda: {'ids': [str(i) for i in created]}),
+    ('artists', 'GET', lambda c: '/artists', None),
+    ('search_artists', 'POST', lambda c: '/artists/search', lambda: {'search_term': term()}),
+    ('artists_available', 'GET', lambda c: '/artists/available?date={}'.format(future()[:10]), None),
+    ('show_artist', 'GET', lambda c: '/artists/{}'.format(some_id()), None),
+    ('artist_shows', 'GET', lambda c: '/artists/{}/shows/{}'.format(some_id(), section()), None),
+    ('create_artist_form', 'GET', lambda c: '/artists/create', None),
+    ('create_artist_submission', 'POST', lambda c: '/artists/create', lambda: artist_form(rng.randint(0, 10 ** 9))),
+    ('edit_artist', 'GET', lambda c: '/artists/{}/edit'.format(some_id()), None),
+    ('edit_artist_submission', 'POST', lambda c: '/artists/{}/edit'.format(some_id()), lambda: artist_form(rng.randint(0, 10 ** 9))),
+    ('shows', 'GET', lambda c: '/shows', None),
+    ('create_shows', 'GET', lambda c: '/shows/create', None),
+    ('create_show_submission', 'POST', lambda c: '/shows/create',
+      lambda: {'venue_id': str(some_id()), 'artist_id': str(some_id()), 'start_time': future()}),
+    ('genres_facets', 'GET', lambda c: '/genres/facets?entity={}'.format(rng.choice(['venues', 'artists'])), None),
+    ('cache_stats', 'GET', lambda c: '/cache/stats', None),
+    ('api.venues', 'GET', lambda c: '/api/v1/venues', None),
+    ('api.search_venues', 'GET', lambda c: '/api/v1/venues/search?search_term={}'.format(term()), None),
+    ('api.venue', 'GET', lambda c: '/api/v1/venues/{}'.format(some_id()), None),
+    ('api.venue_shows', 'GET', lambda c: '/api/v1/venues/{}/shows/{}'.format(some_id(), section()), None),
+    ('api.artists', 'GET', lambda c: '/api/v1/artists', None),
+    ('api.search_artists', 'GET', lambda c: '/api/v1/artists/search?search_term={}'.format(term()), None),
+    ('api.artist', 'GET', lambda c: '/api/v1/artists/{}'.format(some_id()), None),
+    ('api.artist_shows', 'GET', lambda c: '/api/v1/artists/{}/shows/{}'.format(some_id(), section()), None),
+    ('api.shows', 'GET', lambda c: '/api/v1/shows', None),
+    ('api.search_shows', 'GET', lambda c: '/api/v1/shows/search?search_term={}'.format(term()), None),
+    ('api.show', 'GET', lambda c: '/api/v1/shows/{}'.format(some_id()), None),
+  ]
+
+
+def uncovered_endpoints(app):
+  """Endpoints of the app that `routes` has no entry for."""
+  ignored = {'static', 'sql_profiler_summary'}
+  covered = {name for name, _, _, _ in routes(1, random.Random())}
+  return sorted({rule.endpoint for rule in app.url_map.iter_rules()} - ignored - covered)
+
+
+def run_scale(app, scale, shows_per_venue, requests, seed):
+  started = time.monotonic()
+  synthetic.generate(scale, scale, scale * shows_per_venue, seed=seed)
+  generated = time.monotonic() - started
+  # built once per process in production; don't charge it to the first request
+  venue_index.load()
+
+  engine = synthetic.db.engine
+  statements = []
+  counting = [False]
+
+  def count(conn, cursor, statement, parameters, context, executemany):
+    if counting[0]:
+      statements.append(statement)
+  event.listen(engine, 'before_cursor_execute', count)
+
+  rng = random.Random(seed)
+  results = {}
+  client = app.test_client()
+  try:
+    for name, method, url, data in routes(scale, rng):
+      latencies, queries, statuses = [], [], set()
+      for _ in range(requests):
+        target = url(client)
+        body = data() if data else None
+        page_cache.clear()
+        del statements[:]
+        counting[0] = True
+        t0 = time.perf_counter()
+        response = client.open(target, method=method, data=body)
+        response.get_data()  # drain streamed responses
+        elapsed = time.perf_counter() - t0
+        counting[0] = False
+        latencies.append(elapsed * 1000)
+        queries.append(len(statements))
+        statuses.add(response.status_code)
+      results[name] = {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries),
+        'statuses': sorted(statuses),
+      }
+      print('  {:<26} p50 {:>9.2f} ms  p95 {:>9.2f} ms  queries {:>5}'.format(
+        name, results[name]['p50_ms'], results[name]['p95_ms'], results[name]['queries_max']))
+  finally:
+    event.remove(engine, 'before_cursor_execute', count)
+
+  return {
+    'venues': scale,
+    'artists': scale,
+    'shows': scale * shows_per_venue,
+    'generate_s': round(generated, 1),
+    'routes': results,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database', required=True,
+                      help='SQLAlchemy URL of a scratch database (all tables are dropped)')
+  parser.add_argument('--scales', default='1000,100000,1000000',
+                      help='comma separated venue/artist counts')
+  parser.add_argument('--shows-per-venue', type=int, default=5)
+  parser.add_argument('--requests', type=int, default=50, help='requests per route and scale')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--output', help='write the results as JSON to this file')
+  args = parser.parse_args()
+
+  from app import app
+  app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+  app.config['TESTING'] = True
+  # every route of app.py and api.py must be benchmarked
+  missing = uncovered_endpoints(app)
+  if missing:
+    parser.error('no benchmark for: ' + ', '.join(missing))
+
+  report = {
+    'commit': git_revision(),
+    'created': datetime.now().isoformat(),
+    'requests': args.requests,
+    'seed': args.seed,
+    'scales': {},
+  }
+  for scale in (int(s) for s in args.scales.split(',')):
+    print('scale {}'.format(scale))
+    report['scales'][str(scale)] = run_scale(app, scale, args.shows_per_venue, args.requests, args.seed)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+    print('wrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+  main()
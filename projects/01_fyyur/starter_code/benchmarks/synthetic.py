@@ -0,0 +1,157 @@
+"""Seeded synthetic data for fyyur benchmarks.
+
+Generates venues, artists and shows with realistic genre lists (from
+`enums.Genre`) and a Zipf-like city distribution, so a few big cities hold
+most of the venues like real listings do. Rows are written with COPY in
+batches, bypassing the ORM.
+"""
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enums import Genre
+from importer import copy_batch
+from models import db, Venue, Artist, Show, recount_show_counters
+
+BATCH_SIZE = 10000
+
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+  ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+  ('Dallas', 'TX'), ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+  ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Fort Worth', 'TX'), ('Indianapolis', 'IN'),
+  ('Charlotte', 'NC'), ('Seattle', 'WA'), ('Denver', 'CO'), ('Washington', 'DC'),
+  ('Boston', 'MA'), ('Nashville', 'TN'), ('Detroit', 'MI'), ('Portland', 'OR'),
+  ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Louisville', 'KY'), ('Baltimore', 'MD'),
+  ('Milwaukee', 'WI'), ('Albuquerque', 'NM'), ('Tucson', 'AZ'), ('Fresno', 'CA'),
+  ('Sacramento', 'CA'), ('Atlanta', 'GA'), ('Miami', 'FL'), ('Omaha', 'NE'),
+  ('Raleigh', 'NC'), ('Minneapolis', 'MN'), ('Tulsa', 'OK'), ('New Orleans', 'LA'),
+]
+# approximate city centres; venues are scattered around them
+CITY_COORDINATES = {
+  'New York': (40.71, -74.01), 'Los Angeles': (34.05, -118.24), 'Chicago': (41.88, -87.63),
+  'Houston': (29.76, -95.37), 'Phoenix': (33.45, -112.07), 'Philadelphia': (39.95, -75.17),
+  'San Antonio': (29.42, -98.49), 'San Diego': (32.72, -117.16), 'Dallas': (32.78, -96.80),
+  'San Jose': (37.34, -121.89), 'Austin': (30.27, -97.74), 'Jacksonville': (30.33, -81.66),
+  'San Francisco': (37.77, -122.42), 'Columbus': (39.96, -83.00), 'Fort Worth': (32.76, -97.33),
+  'Indianapolis': (39.77, -86.16), 'Charlotte': (35.23, -80.84), 'Seattle': (47.61, -122.33),
+  'Denver': (39.74, -104.99), 'Washington': (38.91, -77.04), 'Boston': (42.36, -71.06),
+  'Nashville': (36.16, -86.78), 'Detroit': (42.33, -83.05), 'Portland': (45.52, -122.68),
+  'Las Vegas': (36.17, -115.14), 'Memphis': (35.15, -90.05), 'Louisville': (38.25, -85.76),
+  'Baltimore': (39.29, -76.61), 'Milwaukee': (43.04, -87.91), 'Albuquerque': (35.08, -106.65),
+  'Tucson': (32.22, -110.97), 'Fresno': (36.74, -119.79), 'Sacramento': (38.58, -121.49),
+  'Atlanta': (33.75, -84.39), 'Miami': (25.76, -80.19), 'Omaha': (41.26, -95.93),
+  'Raleigh': (35.78, -78.64), 'Minneapolis': (44.98, -93.27), 'Tulsa': (36.15, -95.99),
+  'New Orleans': (29.95, -90.07),
+}
+# city i is picked with weight 1 / (i + 1)
+CITY_WEIGHTS = [1 / (i + 1) for i in range(len(CITIES))]
+
+GENRES = [g.name for g in Genre]
+# a handful of genres dominate, the long tail is rare
+GENRE_WEIGHTS = [1 / (i + 1) ** 0.8 for i in range(len(GENRES))]
+
+NAME_WORDS = [
+  'Musical', 'Hop', 'Live', 'Hall', 'Lounge', 'Club', 'Garden', 'Room', 'Cellar',
+  'Blue', 'Note', 'Sound', 'Echo', 'Stage', 'Velvet', 'Underground', 'House',
+  'Band', 'Sax', 'Wild', 'Petals', 'Guns', 'Electric', 'Orchestra', 'Trio', 'Collective',
+]
+
+
+def genres(rng):
+  picked = set(rng.choices(GENRES, GENRE_WEIGHTS, k=rng.randint(1, 4)))
+  return sorted(picked)
+
+
+def name(rng, i):
+  return '{} {} {}'.format(rng.choice(NAME_WORDS), rng.choice(NAME_WORDS), i)
+
+
+def phone(rng):
+  return '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999))
+
+
+def venue_rows(rng, count):
+  for i in range(count):
+    city, state = rng.choices(CITIES, CITY_WEIGHTS)[0]
+    seeking = rng.random() < 0.3
+    lat, lng = CITY_COORDINATES[city]
+    yield {
+      'name': name(rng, i),
+      'city': city,
+      'state': state,
+      'address': '{} Main Street'.format(rng.randint(1, 9999)),
+      'phone': phone(rng),
+      'image_link': 'https://example.com/venues/{}.jpg'.format(i),
+      'facebook_link': 'https://www.facebook.com/venue{}'.format(i),
+      'website': 'https://venue{}.example.com'.format(i),
+      'seeking_talent': seeking,
+      'seeking_description': 'Looking for local talent.' if seeking else '',
+      'genres': genres(rng),
+      'latitude': lat + rng.gauss(0, 0.1),
+      'longitude': lng + rng.gauss(0, 0.1),
+    }
+
+
+def artist_rows(rng, count):
+  for i in range(count):
+    city, state = rng.choices(CITIES, CITY_WEIGHTS)[0]
+    seeking = rng.random() < 0.4
+    yield {
+      'name': name(rng, i),
+      'city': city,
+      'state': state,
+      'phone': phone(rng),
+      'image_link': 'https://example.com/artists/{}.jpg'.format(i),
+      'facebook_link': 'https://www.facebook.com/artist{}'.format(i),
+      'website': 'https://artist{}.example.com'.format(i),
+      'seeking_venue': seeking,
+      'seeking_description': 'Looking for shows.' if seeking else '',
+      'genres': genres(rng),
+    }
+
+
+def show_rows(rng, count, venues, artists, now):
+  # ids are log-uniform, so low ids are the busy venues and artists;
+  # 3/4 of the shows are in the past
+  for _ in range(count):
+    yield {
+      'venue_id': int(venues ** rng.random()),
+      'artist_id': int(artists ** rng.random()),
+      'start_time': now + timedelta(days=rng.uniform(-3 * 365, 365), hours=rng.randint(18, 23)),
+    }
+
+
+def write(model, rows):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) >= BATCH_SIZE:
+      copy_batch(model.__table__, batch)
+      db.session.commit()
+      batch = []
+  if batch:
+    copy_batch(model.__table__, batch)
+    db.session.commit()
+
+
+def generate(venues, artists, shows, seed=0, now=None):
+  """Reset the database and fill it with a reproducible synthetic catalogue.
+
+  Ids are assigned 1..n in insertion order on the freshly created tables.
+  """
+  rng = random.Random(seed)
+  now = now or datetime.now()
+  db.drop_all()
+  db.create_all()
+  write(Venue, venue_rows(rng, venues))
+  write(Artist, artist_rows(rng, artists))
+  write(Show, show_rows(rng, shows, venues, artists, now))
+  recount_show_counters(now)
+  db.session.execute(text('ANALYZE'))
+  db.session.commit()
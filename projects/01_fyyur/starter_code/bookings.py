@@ -0,0 +1,62 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+
+from sqlalchemy import or_, text
+
+from models import db, Show
+
+#----------------------------------------------------------------------------#
+# Booking conflicts
+#----------------------------------------------------------------------------#
+
+# first key of the two-key advisory locks, one namespace per table
+VENUE_LOCK = 1
+ARTIST_LOCK = 2
+
+class BookingConflict(Exception):
+  def __init__(self, conflicts):
+    super(BookingConflict, self).__init__('show overlaps {} existing show(s)'.format(len(conflicts)))
+    self.conflicts = conflicts
+
+def lock_bookings(venue_id, artist_id):
+  """Serialize bookings of this venue and artist until the transaction ends.
+
+  Transaction-scoped advisory locks, always taken venue first, so two
+  concurrent submissions for the same venue or artist run their
+  check-then-insert one after the other and can't deadlock.
+  """
+  lock = text('SELECT pg_advisory_xact_lock(:namespace, :id)')
+  db.session.execute(lock, {'namespace': VENUE_LOCK, 'id': venue_id})
+  db.session.execute(lock, {'namespace': ARTIST_LOCK, 'id': artist_id})
+
+def find_conflicts(venue_id, artist_id, start_time, duration):
+  """Shows at the venue, or by the artist, overlapping a show at `start_time`.
+
+  Shows are `duration` long, so two shows overlap when their start times
+  are less than `duration` apart. Each side of the OR is a range scan on
+  the (venue_id, start_time) / (artist_id, start_time) indexes.
+  """
+  return db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time).\
+    filter(
+      or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+      Show.start_time > start_time - duration,
+      Show.start_time < start_time + duration
+    ).\
+    order_by(Show.start_time).\
+    all()
+
+def book_show(venue_id, artist_id, start_time, duration_minutes):
+  """Add a show unless it double-books the venue or the artist.
+
+  Raises BookingConflict. The caller commits, which releases the locks.
+  """
+  lock_bookings(venue_id, artist_id)
+  conflicts = find_conflicts(venue_id, artist_id, start_time, timedelta(minutes=duration_minutes))
+  if conflicts:
+    raise BookingConflict(conflicts)
+  show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+  db.session.add(show)
+  return show
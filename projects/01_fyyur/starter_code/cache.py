@@ -0,0 +1,169 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import request, session, g, Response
+
+#----------------------------------------------------------------------------#
+# Page cache
+#----------------------------------------------------------------------------#
+
+class PageCache(object):
+  """Thread-safe LRU cache of rendered pages with per-entry expiry.
+
+  Memory is bounded both by number of entries and by total body size; the
+  least recently used pages are evicted first. Every entry carries a set of
+  tags (e.g. ('venue', 1) or 'shows') so writes can drop exactly the pages
+  that display the changed rows.
+  """
+
+  def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=60):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self._entries = OrderedDict()   # key -> (expires_at, tags, page)
+    self._tags = defaultdict(set)   # tag -> keys
+    self._size = 0
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.invalidations = 0
+
+  def init_app(self, app):
+    self.max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', self.max_entries)
+    self.max_bytes = app.config.get('PAGE_CACHE_MAX_BYTES', self.max_bytes)
+    self.ttl = app.config.get('PAGE_CACHE_TTL', self.ttl)
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None or entry[0] < time.monotonic():
+        if entry is not None:
+          self._remove(key)
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[2]
+
+  def set(self, key, page, tags=()):
+    size = len(page[2])
+    if size > self.max_bytes:
+      return
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), page)
+      self._size += size
+      for tag in tags:
+        self._tags[tag].add(key)
+      while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+        self._remove(next(iter(self._entries)))
+        self.evictions += 1
+
+  def invalidate(self, *tags):
+    with self._lock:
+      for tag in tags:
+        for key in self._tags.pop(tag, ()):
+          if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._tags.clear()
+      self._size = 0
+
+  def stats(self):
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        'entries': len(self._entries),
+        'bytes': self._size,
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / lookups if lookups else 0.0,
+        'evictions': self.evictions,
+        'invalidations': self.invalidations,
+        'max_entries': self.max_entries,
+        'max_bytes': self.max_bytes,
+        'ttl': self.ttl,
+      }
+
+  def _remove(self, key):
+    _, tags, page = self._entries.pop(key)
+    self._size -= len(page[2])
+    for tag in tags:
+      keys = self._tags.get(tag)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self._tags[tag]
+
+
+page_cache = PageCache()
+
+#----------------------------------------------------------------------------#
+# View helpers
+#----------------------------------------------------------------------------#
+
+def cache_tags(*tags):
+  """Tag the page being rendered, e.g. with the ids of the rows it shows."""
+  g.setdefault('cache_tags', set()).update(tags)
+
+def cached_page(*tags):
+  """Serve a GET view from `page_cache`, keyed by its full path.
+
+  `tags` are static tags for every page of the view; callables are called
+  with the view arguments to build per-entity tags. Views may add more with
+  `cache_tags`. Pages with pending flash messages are never cached, since
+  the messages are rendered into the layout.
+  """
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+      if request.method != 'GET' or session.get('_flashes'):
+        return view(**kwargs)
+
+      key = request.full_path
+      page = page_cache.get(key)
+      if page is not None:
+        status, mimetype, body = page
+        return Response(body, status=status, mimetype=mimetype)
+
+      response = view(**kwargs)
+      if not isinstance(response, Response):
+        # views returning a plain rendered string
+        response = Response(response)
+      if response.status_code != 200:
+        return response
+
+      page_tags = set(g.pop('cache_tags', ()))
+      for tag in tags:
+        page_tags.update(tag(**kwargs) if callable(tag) else [tag])
+
+      def store(body):
+        page_cache.set(key, (response.status_code, response.mimetype, body), page_tags)
+
+      if response.is_streamed:
+        response.response = _tee(response.response, store)
+      else:
+        store(response.get_data())
+      return response
+    return wrapper
+  return decorator
+
+def _tee(chunks, store):
+  # pass a streamed body through, and cache it once it has been fully sent
+  parts = []
+  for chunk in chunks:
+    parts.append(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    yield chunk
+  store(b''.join(parts))
@@ -11,3 +11,42 @@ DEBUG = True
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://winst@localhost:5432/fyyurapp' 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Rendered page cache (see cache.py)
+PAGE_CACHE_MAX_ENTRIES = 1024
+PAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# seconds; also bounds how long a show can be listed as "upcoming" after it started
+PAGE_CACHE_TTL = 60
+# serve the cache statistics at /cache/stats outside debug mode too
+CACHE_STATS_ENDPOINT = os.getenv('CACHE_STATS_ENDPOINT', '') == '1'
+
+# Per-request SQL statistics and N+1 detection (see profiler.py)
+SQL_PROFILER = os.getenv('SQL_PROFILER', '') == '1'
+SQL_PROFILER_N_PLUS_ONE = 10
+# serve the per-route summary at /_profiler/sql outside debug mode too
+SQL_PROFILER_ENDPOINT = os.getenv('SQL_PROFILER_ENDPOINT', '') == '1'
+
+# Length of a show, used to detect double-booked venues and artists
+SHOW_DURATION_MINUTES = 180
+
+# Error log, written from a bounded queue by a background thread (see log_queue.py)
+LOG_FILE = 'error.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+
+# Most venue/artist ids accepted by one bulk delete request
+BULK_DELETE_MAX = 1000
+
+# In-memory grid index for "venues near me" (see geo.py)
+GEO_INDEX_CELL_DEGREES = 0.25
+GEO_INDEX_TTL = 300
+GEO_NEAR_MAX = 100
+
+# Seconds between full reloads of the in-memory artist calendars (see availability.py)
+AVAILABILITY_TTL = 300
+
+# Fingerprinted, precompressed static files built by `flask build-assets` (see assets.py)
+ASSETS_BUILD_PREFIX = 'build'
+ASSETS_MAX_AGE = 365 * 24 * 3600
@@ -0,0 +1,43 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+
+import dateutil.parser
+import babel
+import babel.dates
+
+#----------------------------------------------------------------------------#
+# Datetime filter
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  """Compiled Babel pattern and parsed locale, resolved once per (format, locale)."""
+  pattern = DATETIME_FORMATS.get(format, format)
+  return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def _format(value, format, locale):
+  pattern, locale = datetime_pattern(format, locale)
+  if value.tzinfo is None:
+    # same as babel.dates.format_datetime: naive values are taken as UTC
+    value = value.replace(tzinfo=babel.dates.UTC)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  """Jinja `datetime` filter.
+
+  `datetime` values are formatted directly; only strings are parsed.
+  Results are memoized, since listings repeat the same show times.
+  """
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  return _format(value, format, locale)
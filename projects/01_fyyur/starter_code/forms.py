@@ -11,12 +11,22 @@ from wtforms import (
     SelectField, 
     SelectMultipleField, 
     DateTimeField, 
-    BooleanField
+    BooleanField,
+    FloatField
 )
-from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Optional
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Optional, NumberRange
+from werkzeug.datastructures import MultiDict
 
 from enums import Genre, State
 
+# computed once; the enums don't change at runtime
+GENRE_CHOICES = Genre.choices()
+STATE_CHOICES = State.choices()
+GENRE_NAMES = frozenset(name for name, _ in GENRE_CHOICES)
+STATE_NAMES = frozenset(name for name, _ in STATE_CHOICES)
+
+PHONE_PATTERN = re.compile(r'^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
+
 #----------------------------------------------------------------------------#
 # Custom Validators
 #----------------------------------------------------------------------------#
@@ -35,17 +45,16 @@ def is_valid_phone(form, field):
 
     Note: (? = optional) 
     """
-    regex = re.compile('^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
     number = field.data
-    if not regex.match(number):
+    if not PHONE_PATTERN.match(number):
         raise ValidationError('Invalid phone.')
 
 def is_valid_genre(form, field):
-    if not set(field.data).issubset(dict(Genre.choices()).keys()):
+    if not GENRE_NAMES.issuperset(field.data):
         raise ValidationError('Invalid genre.')
 
 def is_valid_state(form, field):
-    if field.data not in dict(State.choices()).keys():
+    if field.data not in STATE_NAMES:
         raise ValidationError('Invalid state.')
 
 #----------------------------------------------------------------------------#
@@ -74,7 +83,7 @@ class VenueForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired(), is_valid_state],
-        choices = State.choices()
+        choices = STATE_CHOICES
     )
     address = StringField(
         'address', validators=[DataRequired()]
@@ -88,7 +97,7 @@ class VenueForm(Form):
     genres = SelectMultipleField(
         # TODO implement enum restriction
         'genres', validators=[DataRequired(), is_valid_genre],
-        choices = Genre.choices()
+        choices = GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[Optional(), URL()]
@@ -102,6 +111,12 @@ class VenueForm(Form):
     seeking_description = StringField(
         'seeking_description'
     )
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(-90, 90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(-180, 180)]
+    )
 
 
 
@@ -114,7 +129,7 @@ class ArtistForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired(), is_valid_state],
-        choices = State.choices()
+        choices = STATE_CHOICES
     )
     phone = StringField(
         'phone', validators=[is_valid_phone]
@@ -124,7 +139,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired(), is_valid_genre],
-        choices= Genre.choices()
+        choices= GENRE_CHOICES
      )
     facebook_link = StringField(
         'facebook_link', validators=[Optional(), URL()]
@@ -139,3 +154,54 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+
+#----------------------------------------------------------------------------#
+# Validation helpers
+#----------------------------------------------------------------------------#
+
+def form_errors(form):
+    """Flatten form.errors into ['field-error|error', ...] for flash messages."""
+    return [field + '-' + '|'.join(errors) for field, errors in form.errors.items()]
+
+
+class RecordValidator(object):
+    """Validate many records against one form class, reusing a single form.
+
+    Records are dicts (e.g. a bulk import row or a JSON payload) or
+    MultiDicts. The form is instantiated once and re-processed for every
+    record, so its fields are bound once per batch rather than per record.
+    CSRF is not checked.
+    """
+
+    def __init__(self, form_class):
+        self.form = form_class(formdata=None, meta={'csrf': False})
+        self.boolean_fields = frozenset(
+            f.name for f in self.form if isinstance(f, BooleanField)
+        )
+
+    def formdata(self, record):
+        if isinstance(record, MultiDict):
+            return record
+        formdata = MultiDict()
+        for key, value in record.items():
+            if value is None:
+                continue
+            if isinstance(value, list):
+                formdata.setlist(key, [str(v) for v in value])
+            elif isinstance(value, bool) or key in self.boolean_fields:
+                formdata[key] = 'y' if str(value).lower() in ('1', 'true', 't', 'y', 'yes') else ''
+            else:
+                formdata[key] = str(value)
+        return formdata
+
+    def validate(self, record):
+        """Return (data, None) for a valid record, (None, errors) otherwise."""
+        form = self.form
+        form.process(formdata=self.formdata(record))
+        if form.validate():
+            return form.data, None
+        return None, dict(form.errors)
+
+    def validate_many(self, records):
+        for record in records:
+            yield self.validate(record)
@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import heapq
+import threading
+import time
+from math import radians, sin, cos, asin, sqrt, floor
+from collections import defaultdict
+
+from models import db, Venue
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+#----------------------------------------------------------------------------#
+# Grid index
+#----------------------------------------------------------------------------#
+
+def haversine_km(lat1, lng1, lat2, lng2):
+  lat1, lng1, lat2, lng2 = map(radians, (lat1, lng1, lat2, lng2))
+  a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+  return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class GridIndex(object):
+  """In-memory index of points on a fixed latitude/longitude grid.
+
+  Points are bucketed into square cells of `cell_degrees`. A nearest
+  neighbour query visits rings of cells around the query point, closest
+  first, and stops once no unvisited cell can hold a closer point than the
+  k-th best found, so it only measures distances to nearby points.
+  Longitudes wrap around the antimeridian.
+  """
+
+  def __init__(self, cell_degrees=0.25):
+    self.cell = cell_degrees
+    self.rows = int(round(180 / cell_degrees))
+    self.cols = int(round(360 / cell_degrees))
+    self._cells = defaultdict(dict)
+    self._points = {}
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._points)
+
+  def _key(self, lat, lng):
+    row = min(int(floor((lat + 90) / self.cell)), self.rows - 1)
+    col = int(floor((lng + 180) / self.cell)) % self.cols
+    return row, col
+
+  def upsert(self, point_id, lat, lng):
+    """Add or move a point; a point without coordinates is removed."""
+    with self._lock:
+      self._discard(point_id)
+      if lat is None or lng is None:
+        return
+      key = self._key(lat, lng)
+      self._cells[key][point_id] = (lat, lng)
+      self._points[point_id] = key
+
+  def discard(self, *point_ids):
+    with self._lock:
+      for point_id in point_ids:
+        self._discard(point_id)
+
+  def _discard(self, point_id):
+    key = self._points.pop(point_id, None)
+    if key is not None:
+      cell = self._cells[key]
+      cell.pop(point_id, None)
+      if not cell:
+        del self._cells[key]
+
+  def clear(self):
+    with self._lock:
+      self._cells.clear()
+      self._points.clear()
+
+  def _ring(self, row, col, n):
+    # cells at Chebyshev distance n from (row, col)
+    if n == 0:
+      yield row, col
+      return
+    for dc in range(-n, n + 1):
+      for dr in (-n, n):
+        yield row + dr, (col + dc) % self.cols
+    for dr in range(-n + 1, n):
+      for dc in (-n, n):
+        yield row + dr, (col + dc) % self.cols
+
+  def _ring_bound_km(self, lat, n):
+    # any point outside rings 0..n is at least this far from `lat`
+    spread = n * self.cell
+    widest = min(abs(lat) + (n + 1) * self.cell, 90.0)
+    return spread * KM_PER_DEGREE * cos(radians(widest))
+
+  def _cell_bound_km(self, lat, lng, key):
+    # triangle inequality: the distance to the cell's centre, less the
+    # distance from the centre to its farthest (most equatorward) corner
+    half = self.cell / 2
+    centre_lat = key[0] * self.cell - 90 + half
+    centre_lng = key[1] * self.cell - 180 + half
+    corner_lat = centre_lat - half if centre_lat > 0 else centre_lat + half
+    radius = haversine_km(centre_lat, centre_lng, corner_lat, centre_lng + half)
+    return max(haversine_km(lat, lng, centre_lat, centre_lng) - radius, 0.0)
+
+  def nearest(self, lat, lng, k, max_km=None):
+    """Return up to `k` (distance_km, id) pairs, closest first.
+
+    Rings of cells are visited while that is cheap; once the rings have
+    covered more cells than the index has occupied ones (a query far from
+    any venue), the remaining occupied cells are sorted by distance and
+    visited closest first instead.
+    """
+    row, col = self._key(lat, lng)
+    best = []  # max-heap of (-distance, id), the k closest so far
+    seen = set()
+
+    def visit(key):
+      seen.add(key)
+      for point_id, (plat, plng) in self._cells.get(key, {}).items():
+        distance = haversine_km(lat, lng, plat, plng)
+        if max_km is not None and distance > max_km:
+          continue
+        if len(best) < k:
+          heapq.heappush(best, (-distance, point_id))
+        elif distance < -best[0][0]:
+          heapq.heapreplace(best, (-distance, point_id))
+
+    def done(bound):
+      return (len(best) >= k and -best[0][0] <= bound) or (max_km is not None and bound > max_km)
+
+    with self._lock:
+      n = covered = 0
+      while covered <= len(self._cells):
+        for key in self._ring(row, col, n):
+          if key not in seen and 0 <= key[0] < self.rows:
+            visit(key)
+        if done(self._ring_bound_km(lat, n)):
+          break
+        covered += 8 * n or 1
+        n += 1
+      else:
+        remaining = sorted(
+          (self._cell_bound_km(lat, lng, key), key) for key in self._cells if key not in seen
+        )
+        for bound, key in remaining:
+          if done(bound):
+            break
+          visit(key)
+    return sorted((-d, point_id) for d, point_id in best)
+
+#----------------------------------------------------------------------------#
+# Venue index
+#----------------------------------------------------------------------------#
+
+class VenueIndex(GridIndex):
+  """Grid index of venue coordinates, loaded from the database on first use.
+
+  Routes keep it current with `upsert`/`discard` after each commit. The
+  whole index is reloaded every `ttl` seconds, to pick up venues written by
+  other processes or outside the app.
+  """
+
+  def __init__(self, cell_degrees=0.25, ttl=300):
+    super(VenueIndex, self).__init__(cell_degrees)
+    self.ttl = ttl
+    self.loaded_at = None
+
+  def init_app(self, app):
+    self.__init__(app.config.get('GEO_INDEX_CELL_DEGREES', self.cell),
+                  app.config.get('GEO_INDEX_TTL', self.ttl))
+
+  def load(self):
+    rows = db.session.query(Venue.id, Venue.latitude, Venue.longitude).\
+      filter(Venue.latitude.isnot(None), Venue.longitude.isnot(None)).\
+      yield_per(10000)
+    fresh = GridIndex(self.cell)
+    for venue_id, lat, lng in rows:
+      fresh.upsert(venue_id, lat, lng)
+    with self._lock:
+      self._cells, self._points = fresh._cells, fresh._points
+      self.loaded_at = time.monotonic()
+
+  def nearest(self, lat, lng, k, max_km=None):
+    if self.loaded_at is None or (self.ttl and time.monotonic() - self.loaded_at > self.ttl):
+      self.load()
+    return super(VenueIndex, self).nearest(lat, lng, k, max_km)
+
+venue_index = VenueIndex()
@@ -0,0 +1,203 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import io
+import os
+import csv
+import json
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from forms import ShowForm, VenueForm, ArtistForm, RecordValidator
+from models import db, Venue, Artist, Show, recount_show_counters
+
+#----------------------------------------------------------------------------#
+# Bulk import of partner catalogue dumps
+#----------------------------------------------------------------------------#
+
+IMPORTS = {
+  'venues': (Venue, VenueForm),
+  'artists': (Artist, ArtistForm),
+  'shows': (Show, ShowForm),
+}
+
+# columns that must be present in a row; form defaults would silently fill them
+REQUIRED_COLUMNS = {
+  'shows': ('artist_id', 'venue_id', 'start_time'),
+}
+
+LIST_FIELDS = ('genres',)
+
+def read_rows(path, fmt):
+  """Yield (row, error) for each record of a CSV or JSONL file.
+
+  Files are read one record at a time, so memory does not grow with the
+  size of the dump. List fields in CSV are separated by ';'.
+  """
+  with open(path, newline='', encoding='utf-8') as f:
+    if fmt == 'csv':
+      for row in csv.DictReader(f):
+        for field in LIST_FIELDS:
+          if field in row:
+            row[field] = [v.strip() for v in (row[field] or '').split(';') if v.strip()]
+        yield row, None
+    else:
+      for line in f:
+        if not line.strip():
+          continue
+        try:
+          row = json.loads(line)
+        except ValueError as e:
+          yield {'raw': line.rstrip('\n')}, 'invalid JSON: {}'.format(e)
+          continue
+        if isinstance(row, dict):
+          yield row, None
+        else:
+          yield {'raw': row}, 'expected a JSON object'
+
+def validate_row(validator, entity, row, columns, known_ids=None):
+  """Validate a raw row with the entity's RecordValidator; return (values, errors)."""
+  missing = [c for c in REQUIRED_COLUMNS.get(entity, ()) if row.get(c) in (None, '')]
+  if missing:
+    return None, {c: ['This field is required.'] for c in missing}
+
+  data, errors = validator.validate(row)
+  if errors:
+    return None, errors
+
+  values = {k: v for k, v in data.items() if k in columns}
+  if entity == 'shows':
+    try:
+      values['venue_id'] = int(values['venue_id'])
+      values['artist_id'] = int(values['artist_id'])
+    except ValueError:
+      return None, {'id': ['Ids must be integers.']}
+    if values['venue_id'] not in known_ids['venue']:
+      return None, {'venue_id': ['Unknown venue.']}
+    if values['artist_id'] not in known_ids['artist']:
+      return None, {'artist_id': ['Unknown artist.']}
+  return values, None
+
+#----------------------------------------------------------------------------#
+# Writers
+#----------------------------------------------------------------------------#
+
+def insert_batch(table, rows):
+  # executemany; psycopg2 batches these into multi-row INSERT ... VALUES
+  db.session.execute(table.insert(), rows)
+
+def _pg_array(values):
+  return '{' + ','.join(
+    '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values
+  ) + '}'
+
+def copy_batch(table, rows):
+  """Write rows with PostgreSQL COPY FROM STDIN (CSV) on the session's connection."""
+  columns = list(rows[0].keys())
+  buf = io.StringIO()
+  # strings are quoted, so an unquoted empty field is NULL and "" stays ''
+  writer = csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC)
+  for row in rows:
+    writer.writerow([
+      _pg_array(row[c]) if isinstance(row[c], list) else row[c]
+      for c in columns
+    ])
+  buf.seek(0)
+  cursor = db.session.connection().connection.cursor()
+  cursor.copy_expert(
+    'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(table.name, ', '.join(columns)),
+    buf
+  )
+
+WRITERS = {
+  'insert': insert_batch,
+  'copy': copy_batch,
+}
+
+#----------------------------------------------------------------------------#
+# Command
+#----------------------------------------------------------------------------#
+
+@click.command('import-catalog')
+@click.argument('entity', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Rows written per statement and transaction.')
+@click.option('--method', type=click.Choice(sorted(WRITERS)), default='copy', show_default=True,
+              help='Bulk INSERT (executemany) or PostgreSQL COPY.')
+@click.option('--rejects', type=click.Path(dir_okay=False),
+              help='Write rejected rows and their errors to this JSONL file.')
+@with_appcontext
+def import_command(entity, path, fmt, batch_size, method, rejects):
+  """Stream-import venues, artists or shows from a CSV or JSONL dump."""
+  fmt = fmt or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl')
+  model, form_class = IMPORTS[entity]
+  validator = RecordValidator(form_class)
+  table = model.__table__
+  columns = set(table.columns.keys()) - {'id'}
+  write = WRITERS[method]
+
+  known_ids = None
+  if entity == 'shows':
+    known_ids = {
+      'venue': {i for (i,) in db.session.query(Venue.id)},
+      'artist': {i for (i,) in db.session.query(Artist.id)},
+    }
+
+  # venues and artists with imported shows, whose counters need a recount
+  touched = {'venue': set(), 'artist': set()}
+
+  rejects_file = open(rejects, 'w', encoding='utf-8') if rejects else None
+  started = time.monotonic()
+  read = inserted = rejected = 0
+  batch = []
+
+  def flush():
+    nonlocal inserted
+    if batch:
+      write(table, batch)
+      db.session.commit()
+      inserted += len(batch)
+      if entity == 'shows':
+        touched['venue'].update(row['venue_id'] for row in batch)
+        touched['artist'].update(row['artist_id'] for row in batch)
+      batch.clear()
+      elapsed = time.monotonic() - started
+      click.echo('{}: {} read, {} inserted, {} rejected ({:.0f} rows/s)'.format(
+        entity, read, inserted, rejected, read / elapsed if elapsed else 0))
+
+  try:
+    for record, (row, error) in enumerate(read_rows(path, fmt), start=1):
+      read += 1
+      values, errors = (None, {'row': [error]}) if error else \
+        validate_row(validator, entity, row, columns, known_ids)
+      if errors:
+        rejected += 1
+        if rejects_file:
+          rejects_file.write(json.dumps({'record': record, 'row': row, 'errors': errors}, default=str) + '\n')
+        continue
+      batch.append(values)
+      if len(batch) >= batch_size:
+        flush()
+    flush()
+  except Exception:
+    db.session.rollback()
+    raise
+  finally:
+    if rejects_file:
+      rejects_file.close()
+    if touched['venue']:
+      # bulk writes bypass the Show listeners that maintain the counters; the
+      # batches committed before a failure are recounted too
+      click.echo('Recounting the show counters of {} venues and {} artists...'.format(
+        len(touched['venue']), len(touched['artist'])))
+      recount_show_counters(venue_ids=touched['venue'], artist_ids=touched['artist'])
+
+  elapsed = time.monotonic() - started
+  click.echo('Done: {} read, {} inserted, {} rejected in {:.1f}s ({:.0f} rows/s)'.format(
+    read, inserted, rejected, elapsed, read / elapsed if elapsed else 0))
@@ -0,0 +1,60 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from sqlalchemy.orm import load_only, joinedload, noload
+
+from models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Loading profiles
+#----------------------------------------------------------------------------#
+
+# Relationships are lazy by default (see models.py); each route opts into
+# the columns and relationships it renders by naming one of these profiles.
+#
+#   list   - index pages: id, name and what the listing prints, no shows
+#   detail - the entity page: every column, shows come from queries.detail_shows
+#   edit   - the edit forms: the form's columns only, no shows
+
+VENUE_FORM_COLUMNS = (
+  Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+  Venue.image_link, Venue.genres, Venue.facebook_link, Venue.website,
+  Venue.seeking_talent, Venue.seeking_description, Venue.latitude, Venue.longitude,
+)
+
+ARTIST_FORM_COLUMNS = (
+  Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+  Artist.image_link, Artist.genres, Artist.facebook_link, Artist.website,
+  Artist.seeking_venue, Artist.seeking_description,
+)
+
+PROFILES = {
+  Venue: {
+    'list': (
+      load_only(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count),
+      noload(Venue.shows),
+    ),
+    'detail': (noload(Venue.shows),),
+    'edit': (load_only(*VENUE_FORM_COLUMNS), noload(Venue.shows)),
+  },
+  Artist: {
+    'list': (
+      load_only(Artist.id, Artist.name, Artist.city, Artist.state, Artist.upcoming_shows_count),
+      noload(Artist.shows),
+    ),
+    'detail': (noload(Artist.shows),),
+    'edit': (load_only(*ARTIST_FORM_COLUMNS), noload(Artist.shows)),
+  },
+  Show: {
+    # many-to-one: joining is a single query with no row fan-out
+    'list': (
+      joinedload(Show.venue).load_only(Venue.id, Venue.name),
+      joinedload(Show.artist).load_only(Artist.id, Artist.name, Artist.image_link),
+    ),
+  },
+}
+
+def query(model, profile):
+  """`model.query` with the options of the named loading profile applied."""
+  return model.query.options(*PROFILES[model][profile])
@@ -0,0 +1,144 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import queue
+import atexit
+import logging
+import threading
+from logging import Formatter
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+#----------------------------------------------------------------------------#
+# Queued logging
+#----------------------------------------------------------------------------#
+
+# Request threads only put records on a bounded queue; a single listener
+# thread takes them off in batches and writes them to a rotating file, so
+# a slow disk or a burst of errors never blocks a request.
+
+class DroppingQueueHandler(QueueHandler):
+  """QueueHandler that drops the record, and counts it, when the queue is full."""
+
+  def __init__(self, records):
+    super(DroppingQueueHandler, self).__init__(records)
+    self.dropped = 0
+    self._dropped_lock = threading.Lock()
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      with self._dropped_lock:
+        self.dropped += 1
+
+
+class BatchingListener(object):
+  """Background thread writing queued records to a file handler in batches.
+
+  Up to `batch_size` records are written with one flush. Records dropped
+  by `source` since the last batch are reported with a warning line.
+  """
+
+  def __init__(self, records, handler, source, batch_size=256, interval=1.0):
+    self.queue = records
+    self.handler = handler
+    self.source = source
+    self.batch_size = batch_size
+    self.interval = interval
+    self.reported_drops = 0
+    self._thread = None
+
+  def start(self):
+    self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    # the sentinel is queued behind every pending record, so they are all written
+    if self._thread is None:
+      return
+    self.queue.put(None)
+    self._thread.join()
+    self._thread = None
+    self.handler.close()
+
+  def _run(self):
+    stopping = False
+    while not stopping:
+      try:
+        batch = [self.queue.get(timeout=self.interval)]
+      except queue.Empty:
+        batch = []
+      while batch and len(batch) < self.batch_size:
+        try:
+          batch.append(self.queue.get_nowait())
+        except queue.Empty:
+          break
+      if None in batch:
+        stopping = True
+        batch = [r for r in batch if r is not None]
+
+      dropped = self.source.dropped - self.reported_drops
+      if dropped:
+        self.reported_drops += dropped
+        batch.append(logging.makeLogRecord({
+          'name': __name__,
+          'levelno': logging.WARNING,
+          'levelname': 'WARNING',
+          'pathname': __file__,
+          'msg': 'log queue full, dropped %d record(s)',
+          'args': (dropped,),
+        }))
+      if batch:
+        self.write(batch)
+
+  def write(self, records):
+    handler = self.handler
+    handler.acquire()
+    try:
+      for record in records:
+        if record.levelno < handler.level:
+          continue
+        try:
+          if handler.shouldRollover(record):
+            handler.doRollover()
+          if handler.stream is None:
+            handler.stream = handler._open()
+          handler.stream.write(handler.format(record) + handler.terminator)
+        except Exception:
+          handler.handleError(record)
+      if handler.stream is not None:
+        handler.stream.flush()
+    finally:
+      handler.release()
+
+
+def init_queued_logging(app):
+  """Send `app.logger` records to a rotating file through a bounded queue.
+
+  Returns the queue handler, whose `dropped` attribute counts the records
+  lost while the queue was full.
+  """
+  records = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000))
+  queue_handler = DroppingQueueHandler(records)
+  queue_handler.setLevel(logging.INFO)
+
+  file_handler = RotatingFileHandler(
+    app.config.get('LOG_FILE', 'error.log'),
+    maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+    backupCount=app.config.get('LOG_BACKUP_COUNT', 5),
+    delay=True
+  )
+  file_handler.setFormatter(
+    Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+  )
+  file_handler.setLevel(logging.INFO)
+
+  listener = BatchingListener(records, file_handler, queue_handler,
+                              batch_size=app.config.get('LOG_BATCH_SIZE', 256))
+  listener.start()
+  atexit.register(listener.stop)
+
+  app.logger.setLevel(logging.INFO)
+  app.logger.addHandler(queue_handler)
+  return queue_handler
@@ -0,0 +1,24 @@
+"""add show (start_time, id) index for keyset pagination
+
+Revision ID: 0ff531448c51
+Revises: 8e7fb3bf2fd8
+Create Date: 2026-10-18 10:41:55.270948
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ff531448c51'
+down_revision = '8e7fb3bf2fd8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
@@ -0,0 +1,42 @@
+"""add show counters to venue and artist
+
+Revision ID: 11ac2401890c
+Revises: 8e505a3a5160
+Create Date: 2026-10-18 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '11ac2401890c'
+down_revision = '8e505a3a5160'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('show', sa.Column('counted_upcoming', sa.Boolean(), server_default='false', nullable=False))
+    op.create_index('ix_show_counted_upcoming_start_time', 'show', ['start_time'],
+                    postgresql_where=sa.text('counted_upcoming'))
+
+    # backfill the counters from the existing shows
+    op.execute("UPDATE show SET counted_upcoming = (start_time IS NOT NULL AND start_time > now())")
+    for table in ('venue', 'artist'):
+        op.execute("""
+            UPDATE {0} SET
+              upcoming_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND show.counted_upcoming),
+              past_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND NOT show.counted_upcoming)
+        """.format(table))
+
+
+def downgrade():
+    op.drop_index('ix_show_counted_upcoming_start_time', table_name='show')
+    op.drop_column('show', 'counted_upcoming')
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
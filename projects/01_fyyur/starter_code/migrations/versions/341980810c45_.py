@@ -0,0 +1,26 @@
+"""add venue latitude and longitude
+
+Revision ID: 341980810c45
+Revises: a5521188e764
+Create Date: 2026-10-18 13:05:52.104718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '341980810c45'
+down_revision = 'a5521188e764'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
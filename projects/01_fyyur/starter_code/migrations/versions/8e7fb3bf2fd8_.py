@@ -0,0 +1,37 @@
+"""add trigram search indexes on venue and artist
+
+Revision ID: 8e7fb3bf2fd8
+Revises: 11ac2401890c
+Create Date: 2026-10-18 10:02:17.904311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e7fb3bf2fd8'
+down_revision = '11ac2401890c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_text(name varchar, city varchar, genres varchar[])
+        RETURNS text LANGUAGE sql IMMUTABLE AS $$
+          SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(array_to_string(genres, ' '), ''))
+        $$
+    """)
+    for table in ('venue', 'artist'):
+        op.execute(
+            "CREATE INDEX ix_{0}_search_trgm ON {0} "
+            "USING gin (fyyur_search_text(name, city, genres) gin_trgm_ops)".format(table)
+        )
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{0}_search_trgm'.format(table), table_name=table)
+    op.execute("DROP FUNCTION IF EXISTS fyyur_search_text(varchar, varchar, varchar[])")
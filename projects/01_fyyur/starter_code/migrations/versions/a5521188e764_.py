@@ -0,0 +1,26 @@
+"""add show indexes on (venue_id, start_time) and (artist_id, start_time)
+
+Revision ID: a5521188e764
+Revises: fad443588db3
+Create Date: 2026-10-18 12:41:07.318290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5521188e764'
+down_revision = 'fad443588db3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
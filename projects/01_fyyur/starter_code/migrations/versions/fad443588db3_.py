@@ -0,0 +1,26 @@
+"""add GIN indexes on venue and artist genres
+
+Revision ID: fad443588db3
+Revises: 0ff531448c51
+Create Date: 2026-10-18 12:20:31.662054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fad443588db3'
+down_revision = '0ff531448c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_venue_genres', table_name='venue')
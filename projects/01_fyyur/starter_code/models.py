@@ -1,4 +1,8 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy 
+from sqlalchemy import event, text, DDL
+from sqlalchemy.dialects.postgresql import ARRAY
 
 db = SQLAlchemy() 
 
@@ -34,13 +38,27 @@ class Venue(db.Model):
   website = db.Column(db.String(120))
   seeking_talent = db.Column(db.Boolean)
   seeking_description = db.Column(db.String())
-  genres = db.Column(db.ARRAY(db.String(30)))
+  # the postgresql ARRAY, whose contains() is `@>`; the generic one has none
+  genres = db.Column(ARRAY(db.String(30)))
+  # denormalized show counters, maintained by the Show listeners below
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  # WGS84 coordinates, indexed in memory by geo.py for proximity search
+  latitude = db.Column(db.Float)
+  longitude = db.Column(db.Float)
 #   genres = db.relationship('Genre', 
 #       secondary=venue_genres, 
 #       backref=db.backref('venue', lazy=True),
 #   ) 
-  #set lazy to "joined" to get all the info from Show in a single SQL statement when querying venue
-  shows = db.relationship('Show', lazy="joined", cascade="save-update, delete", backref='venue')
+  # lazy by default; routes choose how (and whether) to load shows with the
+  # profiles in loading.py. Shows that aren't loaded are removed by the
+  # ON DELETE CASCADE foreign keys rather than loaded and deleted one by one.
+  shows = db.relationship('Show', cascade="save-update, delete", passive_deletes=True, back_populates='venue')
+
+  __table_args__ = (
+    # genre filters (`genres @> ARRAY[...]`) and facets
+    db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+  )
 
 class Artist(db.Model):
   __tablename__ = 'artist'
@@ -57,13 +75,23 @@ class Artist(db.Model):
   website = db.Column(db.String(120))
   seeking_venue = db.Column(db.Boolean)
   seeking_description = db.Column(db.String())
-  genres = db.Column(db.ARRAY(db.String(30)))
+  genres = db.Column(ARRAY(db.String(30)))
+  # denormalized show counters, maintained by the Show listeners below
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 #   genres = db.relationship('Genre', 
 #       secondary=artist_genres, 
 #       backref=db.backref('artist', lazy=True)
 # ) 
-  #set lazy to "joined" to get all the info from Show in a single SQL statement when querying artist
-  shows = db.relationship('Show', lazy="joined", cascade="save-update, delete", backref='artist')
+  # lazy by default; routes choose how (and whether) to load shows with the
+  # profiles in loading.py. Shows that aren't loaded are removed by the
+  # ON DELETE CASCADE foreign keys rather than loaded and deleted one by one.
+  shows = db.relationship('Show', cascade="save-update, delete", passive_deletes=True, back_populates='artist')
+
+  __table_args__ = (
+    # genre filters (`genres @> ARRAY[...]`) and facets
+    db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+  )
 
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
@@ -74,5 +102,193 @@ class Show(db.Model):
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete="CASCADE"))
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete="CASCADE"))
   start_time = db.Column(db.DateTime)
+  # whether this show is currently counted as upcoming by its venue and artist
+  counted_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default='false')
+  # declared here rather than as backrefs so that Show.venue and Show.artist
+  # exist before the mappers are configured (loading.py uses them at import)
+  venue = db.relationship('Venue', back_populates='shows')
+  artist = db.relationship('Artist', back_populates='shows')
+
+  __table_args__ = (
+    # keeps the rollover job from scanning past shows
+    db.Index('ix_show_counted_upcoming_start_time', 'start_time', postgresql_where=text('counted_upcoming')),
+    # keyset pagination of the shows listing
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    # booking conflict checks and per-venue/artist show listings
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+  )
+
+
+#----------------------------------------------------------------------------#
+# Show counters
+#----------------------------------------------------------------------------#
+
+def _bump_show_counters(connection, show, upcoming, past):
+  for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    if entity_id is None:
+      continue
+    table = model.__table__
+    connection.execute(
+      table.update().
+        where(table.c.id == entity_id).
+        values(
+          upcoming_shows_count=table.c.upcoming_shows_count + upcoming,
+          past_shows_count=table.c.past_shows_count + past
+        )
+    )
+
+@event.listens_for(Show, 'before_insert')
+def _classify_show(mapper, connection, show):
+  show.counted_upcoming = show.start_time is not None and show.start_time > datetime.now()
+
+@event.listens_for(Show, 'after_insert')
+def _count_show(mapper, connection, show):
+  if show.counted_upcoming:
+    _bump_show_counters(connection, show, 1, 0)
+  else:
+    _bump_show_counters(connection, show, 0, 1)
+
+@event.listens_for(Show, 'after_delete')
+def _uncount_show(mapper, connection, show):
+  if show.counted_upcoming:
+    _bump_show_counters(connection, show, -1, 0)
+  else:
+    _bump_show_counters(connection, show, 0, -1)
+
+
+# Flags shows whose start_time has passed and moves them from the upcoming
+# to the past counters of their venue and artist, all in one statement.
+ROLLOVER_SQL = text("""
+  WITH rolled AS (
+    UPDATE show SET counted_upcoming = false
+    WHERE counted_upcoming AND start_time <= :now
+    RETURNING venue_id, artist_id
+  ), venues AS (
+    UPDATE venue SET
+      upcoming_shows_count = venue.upcoming_shows_count - c.n,
+      past_shows_count = venue.past_shows_count + c.n
+    FROM (SELECT venue_id, count(*) AS n FROM rolled GROUP BY venue_id) c
+    WHERE venue.id = c.venue_id
+  )
+  UPDATE artist SET
+    upcoming_shows_count = artist.upcoming_shows_count - c.n,
+    past_shows_count = artist.past_shows_count + c.n
+  FROM (SELECT artist_id, count(*) AS n FROM rolled GROUP BY artist_id) c
+  WHERE artist.id = c.artist_id
+""")
+
+def rollover_show_counters(now=None):
+  """Move shows that have started since the last run from upcoming to past.
+
+  Meant to be run periodically (see the `rollover-shows` command); between
+  runs a show that just started is still counted as upcoming.
+  """
+  db.session.execute(ROLLOVER_SQL, {'now': now or datetime.now()})
+  db.session.commit()
+
+
+RECOUNT_FLAGS = """
+  UPDATE show SET counted_upcoming = (start_time IS NOT NULL AND start_time > :now)
+"""
+RECOUNT_COUNTERS = """
+  UPDATE {0} SET
+    upcoming_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND show.counted_upcoming),
+    past_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND NOT show.counted_upcoming)
+"""
+
+RECOUNT_SQL = [text(RECOUNT_FLAGS)] + [
+  text(RECOUNT_COUNTERS.format(table)) for table in ('venue', 'artist')
+]
+
+# The same for some venues and artists only. A show is reclassified only when
+# both its venue and its artist are recounted, so that neither side is left
+# counting it in the other half.
+RECOUNT_IDS_SQL = [text(RECOUNT_FLAGS + """
+  WHERE venue_id = ANY(:venue_ids) AND artist_id = ANY(:artist_ids)
+""")] + [
+  text(RECOUNT_COUNTERS.format(table) + """
+  WHERE id = ANY(:{0}_ids)
+""".format(table)) for table in ('venue', 'artist')
+]
+
+def recount_show_counters(now=None, venue_ids=None, artist_ids=None):
+  """Rebuild the show counters from the show table.
+
+  Use after writes that bypass the ORM (bulk imports, manual SQL) or to
+  repair counters that drifted. With `venue_ids` or `artist_ids`, only the
+  counters of those venues and artists are rebuilt.
+  """
+  params = {'now': now or datetime.now()}
+  statements = RECOUNT_SQL
+  if venue_ids is not None or artist_ids is not None:
+    params['venue_ids'] = list(venue_ids or ())
+    params['artist_ids'] = list(artist_ids or ())
+    statements = RECOUNT_IDS_SQL
+  for statement in statements:
+    db.session.execute(statement, params)
+  db.session.commit()
+
+
+# Deletes venues (or artists) by id; their shows go with them through the
+# ON DELETE CASCADE foreign keys. The counters of the other side are
+# decremented from the same snapshot of the show table, so the whole
+# delete is one statement however many shows there are.
+DELETE_SQL = {
+  own: text("""
+    WITH deleted AS (
+      DELETE FROM {own} WHERE id = ANY(:ids) RETURNING id
+    ), uncounted AS (
+      UPDATE {other} SET
+        upcoming_shows_count = {other}.upcoming_shows_count - c.upcoming,
+        past_shows_count = {other}.past_shows_count - c.past
+      FROM (
+        SELECT {other}_id,
+          count(*) FILTER (WHERE counted_upcoming) AS upcoming,
+          count(*) FILTER (WHERE NOT counted_upcoming) AS past
+        FROM show WHERE {own}_id = ANY(:ids) GROUP BY {other}_id
+      ) c
+      WHERE {other}.id = c.{other}_id
+      RETURNING {other}.id
+    )
+    SELECT '{own}' AS kind, id FROM deleted
+    UNION ALL
+    SELECT '{other}', id FROM uncounted
+  """.format(own=own, other=other))
+  for own, other in (('venue', 'artist'), ('artist', 'venue'))
+}
+
+def delete_with_shows(model, ids):
+  """Delete venues or artists and all of their shows, without loading them.
+
+  Returns a dict of the deleted ids and the ids of the other side whose
+  counters changed, keyed by table name ('venue', 'artist'). The caller
+  commits.
+  """
+  affected = {'venue': [], 'artist': []}
+  rows = db.session.execute(DELETE_SQL[model.__tablename__], {'ids': list(ids)})
+  for kind, entity_id in rows:
+    affected[kind].append(entity_id)
+  return affected
+
+
+#----------------------------------------------------------------------------#
+# Search indexes
+#----------------------------------------------------------------------------#
 
+# Mirrors the search migration so that `db.create_all()` (e.g. fixtures.py)
+# builds a database the search queries can run against.
+SEARCH_TEXT_FUNCTION = DDL("""
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+  CREATE OR REPLACE FUNCTION fyyur_search_text(name varchar, city varchar, genres varchar[])
+  RETURNS text LANGUAGE sql IMMUTABLE AS $$
+    SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(array_to_string(genres, ' '), ''))
+  $$;
+""")
+event.listen(db.Model.metadata, 'before_create', SEARCH_TEXT_FUNCTION)
 
+for _table in (Venue.__table__, Artist.__table__):
+  event.listen(_table, 'after_create', DDL(
+    "CREATE INDEX ix_%(table)s_search_trgm ON %(table)s "
+    "USING gin (fyyur_search_text(name, city, genres) gin_trgm_ops)"
+  ))
@@ -0,0 +1,256 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from itertools import groupby
+from datetime import datetime
+
+from flask import request, abort
+from sqlalchemy import tuple_, func
+
+from enums import Genre, State
+from models import db, Venue, Artist, Show
+
+# rows fetched per round trip when streaming large listings
+STREAM_BATCH_SIZE = 1000
+
+SHOWS_PER_PAGE = 30
+
+# shows loaded per section on the venue/artist pages, and per "load more"
+DETAIL_SHOWS_PER_PAGE = 12
+
+#----------------------------------------------------------------------------#
+# Request parameters
+#----------------------------------------------------------------------------#
+
+# shared by the page views (app.py) and the JSON API (api.py)
+
+def listing_filters():
+  # optional ?genre=JAZZ&state=CA narrowing of listings and searches
+  filters = {
+    'genre': request.values.get('genre') or None,
+    'state': request.values.get('state') or None,
+  }
+  if filters['genre'] is not None and filters['genre'] not in Genre.__members__:
+    abort(400)
+  if filters['state'] is not None and filters['state'] not in State.__members__:
+    abort(400)
+  return filters
+
+def show_cursor():
+  # ?after= keyset cursor of a page of shows, see encode_cursor
+  after = request.args.get('after')
+  try:
+    return decode_cursor(after) if after else None
+  except ValueError:
+    abort(400)
+
+#----------------------------------------------------------------------------#
+# Listings
+#----------------------------------------------------------------------------#
+
+def filter_listing(query, model, genre=None, state=None):
+  # `genres @> ARRAY[genre]` is answered by the GIN index on genres
+  if genre is not None:
+    query = query.filter(model.genres.contains([genre]))
+  if state is not None:
+    query = query.filter(model.state == state)
+  return query
+
+def venue_areas(genre=None, state=None):
+  """Yield every area (city, state) with its venues and upcoming show counts.
+
+  Reads the denormalized show counters in a single query ordered by area,
+  so the areas can be built while the rows stream from the cursor instead
+  of loading every venue (and every show) up front. Optionally restricted
+  to a genre and/or state.
+  """
+  rows = db.session.query(
+      Venue.city,
+      Venue.state,
+      Venue.id,
+      Venue.name,
+      Venue.upcoming_shows_count
+    )
+  rows = filter_listing(rows, Venue, genre, state).\
+    order_by(Venue.city, Venue.state, Venue.name, Venue.id).\
+    yield_per(STREAM_BATCH_SIZE)
+
+  for (city, state), venues in groupby(rows, key=lambda r: (r.city, r.state)):
+    yield {
+      'city': city,
+      'state': state,
+      'venues': [{
+        'id': v.id,
+        'name': v.name,
+        'num_upcoming_shows': v.upcoming_shows_count
+      } for v in venues]
+    }
+
+def entity_listing(model, after=None, limit=SHOWS_PER_PAGE, genre=None, state=None):
+  """Venues or artists with their show counters, in id order after `after`.
+
+  Keyset pagination on the primary key; `limit + 1` rows are streamed from
+  the cursor so the caller can tell whether there is a next page.
+  """
+  rows = db.session.query(
+      model.id,
+      model.name,
+      model.city,
+      model.state,
+      model.genres,
+      model.image_link,
+      model.upcoming_shows_count,
+      model.past_shows_count
+    )
+  rows = filter_listing(rows, model, genre, state)
+  if after is not None:
+    rows = rows.filter(model.id > after)
+  return rows.order_by(model.id).limit(limit + 1).yield_per(STREAM_BATCH_SIZE)
+
+def genre_facets(model, state=None):
+  """Number of venues or artists per genre, for every `Genre`, in one query."""
+  genres = db.session.query(func.unnest(model.genres).label('genre'))
+  if state is not None:
+    genres = genres.filter(model.state == state)
+  genres = genres.subquery()
+  counts = dict(
+    db.session.query(genres.c.genre, func.count()).group_by(genres.c.genre).all()
+  )
+  return [{
+    'genre': g.name,
+    'label': g.value,
+    'count': counts.get(g.name, 0)
+  } for g in Genre]
+
+#----------------------------------------------------------------------------#
+# Shows
+#----------------------------------------------------------------------------#
+
+def encode_cursor(start_time, show_id):
+  return '{}_{}'.format(start_time.isoformat(), show_id)
+
+def decode_cursor(cursor):
+  """Parse a cursor made by `encode_cursor`; raises ValueError if malformed."""
+  start_time, _, show_id = cursor.rpartition('_')
+  return datetime.fromisoformat(start_time), int(show_id)
+
+def show_rows(after=None, when=None, venue_id=None, artist_id=None,
+              limit=SHOWS_PER_PAGE, now=None, match=None):
+  """Shows ordered by (start_time, id) after `after`, streamed from the cursor.
+
+  Keyset pagination: `after` is the (start_time, id) of the last show of
+  the previous page, so every page is an index range scan on
+  ix_show_start_time_id no matter how deep it is. Venue and artist columns
+  are joined in the same query. `when` is 'upcoming', 'past' or None;
+  `match` is an extra condition on the show, venue or artist columns.
+  `limit + 1` rows are streamed so the caller can tell whether there is a
+  next page.
+  """
+  now = now or datetime.now()
+  query = db.session.query(
+      Show.id,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ).\
+    join(Venue, Venue.id == Show.venue_id).\
+    join(Artist, Artist.id == Show.artist_id)
+
+  if when == 'upcoming':
+    query = query.filter(Show.start_time > now)
+  elif when == 'past':
+    query = query.filter(Show.start_time <= now)
+  if venue_id is not None:
+    query = query.filter(Show.venue_id == venue_id)
+  if artist_id is not None:
+    query = query.filter(Show.artist_id == artist_id)
+  if match is not None:
+    query = query.filter(match)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+  return query.order_by(Show.start_time, Show.id).limit(limit + 1).yield_per(STREAM_BATCH_SIZE)
+
+def show_listing(after=None, when=None, venue_id=None, artist_id=None,
+                 limit=SHOWS_PER_PAGE, now=None, match=None):
+  """Return one page of `show_rows` as a list, and the next cursor."""
+  rows = show_rows(after, when, venue_id, artist_id, limit, now, match).all()
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+  return rows, next_cursor
+
+
+#----------------------------------------------------------------------------#
+# Venue / Artist detail
+#----------------------------------------------------------------------------#
+
+def section_shows(model, entity_id, section, after=None,
+                  limit=DETAIL_SHOWS_PER_PAGE, now=None):
+  """One page of the upcoming or past shows of a venue or artist.
+
+  Upcoming shows come soonest first, past shows most recent first. Keyset
+  pagination: `after` is the (start_time, id) of the last show of the
+  previous page, so a page is a range scan of ix_show_venue_id_start_time
+  (or the artist one) however many shows the entity has. The other side of
+  the show (artist for a venue, venue for an artist) is joined in the same
+  query. Returns the shows and the cursor of the next page, or None.
+  """
+  now = now or datetime.now()
+  if model is Venue:
+    own_fk, other, other_fk, prefix = Show.venue_id, Artist, Show.artist_id, 'artist'
+  else:
+    own_fk, other, other_fk, prefix = Show.artist_id, Venue, Show.venue_id, 'venue'
+
+  query = db.session.query(
+      Show.id,
+      Show.start_time,
+      other.id.label('other_id'),
+      other.name.label('other_name'),
+      other.image_link.label('other_image_link')
+    ).\
+    join(other, other.id == other_fk).\
+    filter(own_fk == entity_id)
+
+  key = tuple_(Show.start_time, Show.id)
+  if section == 'upcoming':
+    query = query.filter(Show.start_time > now).order_by(Show.start_time, Show.id)
+    if after is not None:
+      query = query.filter(key > tuple_(*after))
+  else:
+    query = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+    if after is not None:
+      query = query.filter(key < tuple_(*after))
+
+  rows = query.limit(limit + 1).all()
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+  shows = [{
+    prefix + '_id': r.other_id,
+    prefix + '_name': r.other_name,
+    prefix + '_image_link': r.other_image_link,
+    'start_time': r.start_time
+  } for r in rows]
+  return shows, next_cursor
+
+def detail_shows(model, entity_id, now=None):
+  """The first page of the upcoming and of the past shows of a venue or artist.
+
+  Returns both pages with the cursors that continue them (see
+  `section_shows`); the number of shows in each half is the entity's
+  upcoming/past show counter.
+  """
+  now = now or datetime.now()
+  data = {}
+  for section in ('upcoming', 'past'):
+    shows, next_cursor = section_shows(model, entity_id, section, now=now)
+    data[section + '_shows'] = shows
+    data[section + '_shows_next'] = next_cursor
+  return data
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from math import ceil
+
+from sqlalchemy import func, case, or_
+
+from models import db, Venue, Artist
+from queries import filter_listing
+
+SEARCH_PER_PAGE = 20
+
+#----------------------------------------------------------------------------#
+# Search
+#----------------------------------------------------------------------------#
+
+def search_document(model):
+  """Lowercased `name city genres` text that the trigram indexes are built on.
+
+  `fyyur_search_text` is an IMMUTABLE SQL function created by the search
+  migration; queries must use the exact same expression for the planner to
+  pick the GIN index.
+  """
+  return func.fyyur_search_text(model.name, model.city, model.genres)
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search(model, term, page=1, per_page=SEARCH_PER_PAGE, genre=None, state=None):
+  """Case-insensitive substring search over name, city and genres.
+
+  Results are ranked with name matches first, then by trigram similarity
+  to the name, and paginated. Returns a dict with the page of rows and the
+  total number of matches. `genre` and `state` narrow the results further.
+  """
+  term = term.strip().lower()
+  page = max(page, 1)
+  pattern = '%' + escape_like(term) + '%'
+  matches = search_document(model).like(pattern, escape='\\')
+
+  rank = (
+    case([(func.lower(model.name).like(pattern, escape='\\'), 1)], else_=0).desc(),
+    func.similarity(func.lower(model.name), term).desc(),
+    model.name,
+    model.id,
+  )
+  rows = db.session.query(
+      model.id,
+      model.name,
+      model.upcoming_shows_count,
+      func.count().over().label('total')
+    ).\
+    filter(matches)
+  rows = filter_listing(rows, model, genre, state).\
+    order_by(*rank).\
+    limit(per_page).\
+    offset((page - 1) * per_page).\
+    all()
+
+  if rows:
+    total = rows[0].total
+  elif page > 1:
+    # past the last page the window count is unavailable
+    total = filter_listing(db.session.query(func.count(model.id)).filter(matches), model, genre, state).scalar()
+  else:
+    total = 0
+
+  return {
+    'count': total,
+    'page': page,
+    'pages': ceil(total / per_page),
+    'data': [{
+      'id': r.id,
+      'name': r.name,
+      'num_upcoming_shows': r.upcoming_shows_count,
+    } for r in rows]
+  }
+
+def show_match(term):
+  """Condition matching shows whose venue or artist matches `term`.
+
+  For `queries.show_rows`, which joins both sides of the show.
+  """
+  pattern = '%' + escape_like(term.strip().lower()) + '%'
+  return or_(
+    search_document(Venue).like(pattern, escape='\\'),
+    search_document(Artist).like(pattern, escape='\\')
+  )
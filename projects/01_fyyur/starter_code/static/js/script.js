@@ -2,3 +2,16 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// "Load more" on the venue and artist pages: fetch the next page of the
+// section and put it in place of the button
+document.addEventListener('click', function(e) {
+  var link = e.target.closest('.load-more a');
+  if (!link) {
+    return;
+  }
+  e.preventDefault();
+  fetch(link.href)
+    .then(function(response) { return response.text(); })
+    .then(function(html) { link.parentNode.outerHTML = html; });
+});
@@ -0,0 +1,60 @@
+#----------------------------------------------------------------------------#
+# Smoke tests of the app; none of these touch the database.
+#
+#   python -m unittest test_app test_units
+#----------------------------------------------------------------------------#
+
+import json
+import unittest
+
+from app import app
+
+
+class AppSmokeTest(unittest.TestCase):
+
+  def setUp(self):
+    self.client = app.test_client()
+
+  def test_every_route_is_registered(self):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+    for endpoint in ('index', 'venues', 'venues_near', 'show_venue', 'artists',
+                     'artists_available', 'shows', 'create_show_submission',
+                     'bulk_delete', 'genres_facets', 'api.venues', 'api.shows'):
+      self.assertIn(endpoint, endpoints)
+
+  def test_index(self):
+    res = self.client.get('/')
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'Fyyur', res.data)
+
+  def test_create_forms_render(self):
+    for url in ('/venues/create', '/artists/create', '/shows/create'):
+      res = self.client.get(url)
+      self.assertEqual(res.status_code, 200, url)
+      self.assertIn(b'<form', res.data)
+
+  def test_not_found(self):
+    res = self.client.get('/no/such/page')
+    self.assertEqual(res.status_code, 404)
+
+  def test_bad_parameters_are_rejected_before_querying(self):
+    for url in ('/venues/near?lat=91&lng=0', '/artists/available?date=yesterday',
+                '/genres/facets?entity=shows', '/api/v1/venues?genre=NOT_A_GENRE'):
+      self.assertEqual(self.client.get(url).status_code, 400, url)
+
+  def test_bulk_delete_rejects_anything_but_a_list_of_ints(self):
+    for ids in ('3', '12', [True], [1.0], ['1'], [[1]], {'1': 1}, None, []):
+      res = self.client.post('/artists/delete', json={'ids': ids})
+      self.assertEqual(res.status_code, 400, ids)
+    self.assertEqual(self.client.post('/venues/delete', json=[1]).status_code, 400)
+    self.assertEqual(self.client.post('/venues/delete', data={'ids': ['1', 'x']}).status_code, 400)
+
+  def test_cache_stats_in_debug_mode(self):
+    self.assertTrue(app.debug)
+    res = self.client.get('/cache/stats')
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('hit_rate', json.loads(res.data))
+
+
+if __name__ == '__main__':
+  unittest.main()
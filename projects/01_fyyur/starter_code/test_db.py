@@ -0,0 +1,276 @@
+#----------------------------------------------------------------------------#
+# Route tests against PostgreSQL. The schema is dropped and created again,
+# so point TEST_DATABASE_URL at a scratch database:
+#
+#   createdb fyyur_test
+#   TEST_DATABASE_URL=postgresql://localhost/fyyur_test python -m unittest test_db
+#----------------------------------------------------------------------------#
+
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from flask import Flask, g
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app import app, db
+from models import Venue, Artist, Show
+from cache import page_cache
+from queries import DETAIL_SHOWS_PER_PAGE
+from profiler import SQLProfiler
+import importer
+
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur_test')
+
+
+class DatabaseTestCase(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    app.config['SQLALCHEMY_DATABASE_URI'] = TEST_DATABASE_URL
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+  @classmethod
+  def tearDownClass(cls):
+    db.session.remove()
+    db.drop_all()
+
+  def setUp(self):
+    self.client = app.test_client()
+    page_cache.clear()
+
+  def add(self, *records):
+    db.session.add_all(records)
+    db.session.commit()
+    return records
+
+
+class GenreFilterTest(DatabaseTestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    db.session.add_all([
+      Venue(name='Jazz Cellar', city='San Francisco', state='CA', genres=['JAZZ', 'BLUES']),
+      Venue(name='Rock Hall', city='San Francisco', state='CA', genres=['ROCKNROLL']),
+      Artist(name='Sax Trio', city='Austin', state='TX', genres=['JAZZ'], seeking_venue=True),
+      Artist(name='Loud Band', city='Austin', state='TX', genres=['PUNK'], seeking_venue=True),
+    ])
+    db.session.commit()
+
+  def test_venue_listing_by_genre(self):
+    res = self.client.get('/venues?genre=JAZZ', buffered=True)
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'Jazz Cellar', res.data)
+    self.assertNotIn(b'Rock Hall', res.data)
+
+  def test_artist_listing_by_genre(self):
+    res = self.client.get('/artists?genre=PUNK')
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'Loud Band', res.data)
+    self.assertNotIn(b'Sax Trio', res.data)
+
+  def test_search_by_genre(self):
+    res = self.client.post('/venues/search', data={'search_term': 'a', 'genre': 'BLUES'})
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'Jazz Cellar', res.data)
+    self.assertNotIn(b'Rock Hall', res.data)
+
+  def test_available_artists_by_genre(self):
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    res = self.client.get('/artists/available?date={}&genre=JAZZ'.format(tomorrow))
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual([a['name'] for a in json.loads(res.data)['artists']], ['Sax Trio'])
+
+  def test_api_venues_by_genre(self):
+    res = self.client.get('/api/v1/venues?genre=ROCKNROLL', buffered=True)
+    self.assertEqual(res.status_code, 200)
+    names = [v['name'] for v in json.loads(res.data)['data']]
+    self.assertEqual(names, ['Rock Hall'])
+
+  def test_genre_facets(self):
+    res = self.client.get('/genres/facets?entity=venues')
+    counts = {f['genre']: f['count'] for f in json.loads(res.data)['facets']}
+    self.assertEqual((counts['JAZZ'], counts['ROCKNROLL'], counts['PUNK']), (1, 1, 0))
+
+
+class ShowPagesTest(DatabaseTestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls.venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['JAZZ'])
+    cls.artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['ROCKNROLL'])
+    db.session.add_all([cls.venue, cls.artist])
+    db.session.flush()
+    db.session.add_all([
+      Show(venue_id=cls.venue.id, artist_id=cls.artist.id, start_time=datetime(2019, 5, 21, 21, 30)),
+      Show(venue_id=cls.venue.id, artist_id=cls.artist.id, start_time=datetime.now() + timedelta(days=30)),
+    ])
+    db.session.commit()
+
+  def test_venue_page_lists_both_halves(self):
+    res = self.client.get('/venues/{}'.format(self.venue.id))
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'Guns N Petals', res.data)
+    self.assertIn(b'1 Upcoming Show', res.data)
+    self.assertIn(b'1 Past Show', res.data)
+
+  def test_artist_page_lists_both_halves(self):
+    res = self.client.get('/artists/{}'.format(self.artist.id))
+    self.assertEqual(res.status_code, 200)
+    self.assertIn(b'The Musical Hop', res.data)
+    self.assertIn(b'1 Upcoming Show', res.data)
+    self.assertIn(b'1 Past Show', res.data)
+
+  def test_listings_show_counters(self):
+    res = self.client.get('/venues', buffered=True)
+    self.assertIn(b'The Musical Hop', res.data)
+    res = self.client.get('/shows')
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(res.data.count(b'Guns N Petals'), 2)
+
+  def test_unknown_venue(self):
+    self.assertEqual(self.client.get('/venues/1000000').status_code, 404)
+
+
+class DetailPagingTest(DatabaseTestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls.venue = Venue(name='Busy Hall', city='San Francisco', state='CA', genres=['JAZZ'])
+    db.session.add(cls.venue)
+    db.session.flush()
+    # more past shows than two pages hold, several of them at the same time
+    cls.count = DETAIL_SHOWS_PER_PAGE * 2 + 5
+    for i in range(cls.count):
+      artist = Artist(name='Artist {:03d}'.format(i), city='Austin', state='TX', genres=['JAZZ'])
+      db.session.add(artist)
+      db.session.flush()
+      db.session.add(Show(venue_id=cls.venue.id, artist_id=artist.id,
+                          start_time=datetime(2019, 1, 1) + timedelta(days=i // 2)))
+    db.session.commit()
+
+  def test_load_more_walks_every_past_show_once(self):
+    res = self.client.get('/venues/{}'.format(self.venue.id))
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(res.data.count(b'<div class="tile tile-show">'), DETAIL_SHOWS_PER_PAGE)
+    self.assertIn('{} Past Shows'.format(self.count).encode(), res.data)
+
+    url = '/api/v1/venues/{}/shows/past?limit={}'.format(self.venue.id, DETAIL_SHOWS_PER_PAGE)
+    seen = []
+    while url:
+      page = json.loads(self.client.get(url, buffered=True).data)
+      seen += [(s['start_time'], s['artist_name']) for s in page['data']]
+      url = page['next_cursor'] and '/api/v1/venues/{}/shows/past?after={}'.format(
+        self.venue.id, page['next_cursor'])
+    self.assertEqual(len(seen), self.count)
+    self.assertEqual(len(set(seen)), self.count)
+    self.assertEqual([t for t, _ in seen], sorted((t for t, _ in seen), reverse=True))
+
+  def test_api_shows_pages_stream_every_show_once(self):
+    url = '/api/v1/shows?venue_id={}&limit={}'.format(self.venue.id, DETAIL_SHOWS_PER_PAGE)
+    seen = []
+    while url:
+      page = json.loads(self.client.get(url, buffered=True).data)
+      self.assertLessEqual(len(page['data']), DETAIL_SHOWS_PER_PAGE)
+      seen += [s['artist_name'] for s in page['data']]
+      url = page['next_cursor'] and '/api/v1/shows?venue_id={}&limit={}&after={}'.format(
+        self.venue.id, DETAIL_SHOWS_PER_PAGE, page['next_cursor'])
+    self.assertEqual(seen, ['Artist {:03d}'.format(i) for i in range(self.count)])
+
+  def test_load_more_fragment(self):
+    page = self.client.get('/venues/{}'.format(self.venue.id)).data.decode()
+    url = page.split('<div class="col-sm-12 load-more">')[1].split('href="')[1].split('"')[0]
+    res = self.client.get(url.replace('&amp;', '&'))
+    self.assertEqual(res.status_code, 200)
+    self.assertNotIn(b'<html', res.data)
+    self.assertEqual(res.data.count(b'<div class="tile tile-show">'), DETAIL_SHOWS_PER_PAGE)
+    self.assertIn(b'load-more', res.data)
+
+  def test_malformed_cursor(self):
+    res = self.client.get('/venues/{}/shows/past?after=yesterday'.format(self.venue.id))
+    self.assertEqual(res.status_code, 400)
+
+
+class BulkDeleteTest(DatabaseTestCase):
+
+  def test_deletes_exactly_the_listed_ids(self):
+    artists = self.add(*[Artist(name='Artist {}'.format(i), city='Austin', state='TX') for i in range(3)])
+    ids = [a.id for a in artists]
+
+    res = self.client.post('/artists/delete', json={'ids': ''.join(str(i) for i in ids[:2])})
+    self.assertEqual(res.status_code, 400)
+    self.assertEqual(Artist.query.filter(Artist.id.in_(ids)).count(), 3)
+
+    res = self.client.post('/artists/delete', json={'ids': ids[:2]})
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(sorted(json.loads(res.data)['deleted']), ids[:2])
+    self.assertEqual([a.id for a in Artist.query.filter(Artist.id.in_(ids))], ids[2:])
+
+
+class ImportTest(DatabaseTestCase):
+
+  def test_failed_show_import_recounts_the_committed_batches(self):
+    venue, artist = self.add(
+      Venue(name='Import Hall', city='Austin', state='TX'),
+      Artist(name='Import Band', city='Austin', state='TX'))
+    venue_id, artist_id = venue.id, artist.id
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+      f.write('venue_id,artist_id,start_time\n')
+      for day in (1, 2, 3):
+        f.write('{},{},2019-05-0{} 21:30:00\n'.format(venue_id, artist_id, day))
+    self.addCleanup(os.remove, f.name)
+
+    copy_batch = importer.WRITERS['copy']
+    def fail_third(table, rows):
+      if Show.query.count() == 2:
+        raise RuntimeError('connection lost')
+      copy_batch(table, rows)
+
+    with mock.patch.dict(importer.WRITERS, {'copy': fail_third}):
+      result = app.test_cli_runner().invoke(importer.import_command, ['shows', f.name, '--batch-size', '1'])
+    self.assertIsInstance(result.exception, RuntimeError)
+
+    # the command's app context has removed the session
+    venue, artist = Venue.query.get(venue_id), Artist.query.get(artist_id)
+    self.assertEqual(Show.query.count(), 2)
+    self.assertEqual((venue.past_shows_count, artist.past_shows_count), (2, 2))
+    self.assertEqual((venue.upcoming_shows_count, artist.upcoming_shows_count), (0, 0))
+
+
+class SQLProfilerTest(DatabaseTestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    # registers the engine listeners, which only count inside a profiled request
+    profiled = Flask(__name__)
+    profiled.config['SQL_PROFILER'] = True
+    SQLProfiler(profiled)
+
+  def test_failed_statement_is_not_paired_with_the_next(self):
+    with app.test_request_context():
+      g.sql_profile = profile = {'queries': 0, 'time': 0.0, 'shapes': Counter()}
+      with self.assertRaises(DBAPIError):
+        db.session.execute(text('SELECT 1 / 0'))
+      db.session.rollback()
+      time.sleep(0.2)
+      db.session.execute(text('SELECT 1'))
+      db.session.rollback()
+    self.assertEqual(profile['queries'], 1)
+    self.assertLess(profile['time'], 0.2)
+
+
+if __name__ == '__main__':
+  unittest.main()
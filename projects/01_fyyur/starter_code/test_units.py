@@ -0,0 +1,228 @@
+#----------------------------------------------------------------------------#
+# Unit tests of the database-free building blocks.
+#----------------------------------------------------------------------------#
+
+import time
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+from app import app
+import loading
+from models import Venue, Show
+from cache import PageCache
+from geo import GridIndex, haversine_km
+from availability import Calendar
+from forms import VenueForm, ShowForm, RecordValidator
+from profiler import statement_shape
+
+
+def compile_query(query):
+  return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+class LoadingProfilesTest(unittest.TestCase):
+
+  def test_every_profile_compiles(self):
+    for model, profiles in loading.PROFILES.items():
+      for profile in profiles:
+        self.assertIn('SELECT', compile_query(loading.query(model, profile)))
+
+  def test_list_profile_loads_only_listed_columns(self):
+    sql = compile_query(loading.query(Venue, 'list'))
+    self.assertIn('venue.upcoming_shows_count', sql)
+    self.assertNotIn('venue.address', sql)
+    self.assertNotIn('JOIN', sql)
+
+  def test_show_list_profile_joins_both_sides(self):
+    sql = compile_query(loading.query(Show, 'list'))
+    self.assertIn('JOIN venue', sql)
+    self.assertIn('JOIN artist', sql)
+
+
+class PageCacheTest(unittest.TestCase):
+
+  def page(self, body):
+    return (200, 'text/html', body)
+
+  def test_least_recently_used_page_is_evicted(self):
+    cache = PageCache(max_entries=2)
+    cache.set('/a', self.page(b'a'))
+    cache.set('/b', self.page(b'b'))
+    cache.get('/a')
+    cache.set('/c', self.page(b'c'))
+    self.assertIsNone(cache.get('/b'))
+    self.assertEqual(cache.get('/a'), self.page(b'a'))
+    self.assertEqual(cache.stats()['evictions'], 1)
+
+  def test_size_bound(self):
+    cache = PageCache(max_bytes=10)
+    cache.set('/big', self.page(b'x' * 11))
+    self.assertIsNone(cache.get('/big'))
+    cache.set('/a', self.page(b'x' * 6))
+    cache.set('/b', self.page(b'x' * 6))
+    self.assertIsNone(cache.get('/a'))
+    self.assertEqual(cache.stats()['bytes'], 6)
+
+  def test_invalidate_drops_tagged_pages_only(self):
+    cache = PageCache()
+    cache.set('/venues/1', self.page(b'1'), tags=[('venue', 1)])
+    cache.set('/venues', self.page(b'all'), tags=['venues', ('venue', 1)])
+    cache.set('/artists', self.page(b'all'), tags=['artists'])
+    cache.invalidate(('venue', 1))
+    self.assertIsNone(cache.get('/venues/1'))
+    self.assertIsNone(cache.get('/venues'))
+    self.assertIsNotNone(cache.get('/artists'))
+
+  def test_expired_pages_are_misses(self):
+    cache = PageCache(ttl=0)
+    cache.set('/a', self.page(b'a'))
+    time.sleep(0.001)
+    self.assertIsNone(cache.get('/a'))
+    self.assertEqual(cache.stats()['entries'], 0)
+
+
+class GridIndexTest(unittest.TestCase):
+
+  def brute_force(self, points, lat, lng, k, max_km=None):
+    distances = sorted(
+      (haversine_km(lat, lng, plat, plng), point_id) for point_id, (plat, plng) in points.items()
+    )
+    return [(d, i) for d, i in distances if max_km is None or d <= max_km][:k]
+
+  def test_nearest_matches_brute_force(self):
+    rng = random.Random(0)
+    index = GridIndex(cell_degrees=1.0)
+    points = {}
+    for point_id in range(2000):
+      points[point_id] = (rng.uniform(-60, 60), rng.uniform(-180, 180))
+      index.upsert(point_id, *points[point_id])
+    for _ in range(50):
+      lat, lng = rng.uniform(-89, 89), rng.uniform(-180, 180)
+      self.assertEqual(index.nearest(lat, lng, 5), self.brute_force(points, lat, lng, 5))
+      self.assertEqual(index.nearest(lat, lng, 50, max_km=500),
+                       self.brute_force(points, lat, lng, 50, max_km=500))
+
+  def test_wraps_around_the_antimeridian(self):
+    index = GridIndex()
+    index.upsert(1, 0.0, 179.9)
+    index.upsert(2, 0.0, 170.0)
+    self.assertEqual([i for _, i in index.nearest(0.0, -179.9, 1)], [1])
+
+  def test_upsert_moves_and_discard_removes(self):
+    index = GridIndex()
+    index.upsert(1, 10.0, 10.0)
+    index.upsert(1, -10.0, -10.0)
+    self.assertEqual(len(index), 1)
+    self.assertAlmostEqual(index.nearest(-10.0, -10.0, 1)[0][0], 0.0)
+    index.upsert(1, None, None)
+    self.assertEqual(index.nearest(0.0, 0.0, 1), [])
+    index.upsert(2, 1.0, 1.0)
+    index.discard(2)
+    self.assertEqual(len(index), 0)
+
+
+class CalendarTest(unittest.TestCase):
+
+  def test_bookings_are_merged(self):
+    calendar = Calendar()
+    calendar.book(10, 20)
+    calendar.book(30, 40)
+    calendar.book(20, 30)
+    self.assertEqual((calendar.starts, calendar.ends), ([10], [40]))
+
+  def test_is_free_matches_brute_force(self):
+    rng = random.Random(0)
+    calendar = Calendar()
+    booked = []
+    for _ in range(200):
+      start = rng.randint(0, 10000)
+      end = start + rng.randint(1, 100)
+      calendar.book(start, end)
+      booked.append((start, end))
+    for _ in range(1000):
+      start = rng.randint(0, 10100)
+      end = start + rng.randint(1, 100)
+      overlaps = any(s < end and start < e for s, e in booked)
+      self.assertEqual(calendar.is_free(start, end), not overlaps)
+
+  def test_works_with_datetimes(self):
+    calendar = Calendar()
+    noon = datetime(2030, 1, 1, 12)
+    calendar.book(noon, noon + timedelta(hours=3))
+    self.assertFalse(calendar.is_free(noon + timedelta(hours=1), noon + timedelta(hours=2)))
+    self.assertTrue(calendar.is_free(noon + timedelta(hours=3), noon + timedelta(hours=4)))
+
+
+class RecordValidatorTest(unittest.TestCase):
+
+  venue = {
+    'name': 'The Musical Hop',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '123-123-1234',
+    'genres': ['JAZZ', 'REGGAE'],
+    'seeking_talent': 'true',
+    'latitude': 37.77,
+  }
+
+  def setUp(self):
+    self.context = app.test_request_context()
+    self.context.push()
+
+  def tearDown(self):
+    self.context.pop()
+
+  def test_valid_record(self):
+    data, errors = RecordValidator(VenueForm).validate(self.venue)
+    self.assertIsNone(errors)
+    self.assertEqual(data['genres'], ['JAZZ', 'REGGAE'])
+    self.assertIs(data['seeking_talent'], True)
+    self.assertEqual(data['latitude'], 37.77)
+
+  def test_invalid_records_report_their_fields(self):
+    records = [
+      dict(self.venue, phone='not a phone'),
+      dict(self.venue, genres=['NOT_A_GENRE']),
+      dict(self.venue, state='XX', latitude=91),
+    ]
+    results = list(RecordValidator(VenueForm).validate_many(records))
+    self.assertEqual([sorted(errors) for _, errors in results],
+                     [['phone'], ['genres'], ['latitude', 'state']])
+
+  def test_form_is_reset_between_records(self):
+    validator = RecordValidator(VenueForm)
+    validator.validate(self.venue)
+    data, errors = validator.validate(dict(self.venue, seeking_talent=False, genres=['JAZZ']))
+    self.assertIsNone(errors)
+    self.assertIs(data['seeking_talent'], False)
+    self.assertEqual(data['genres'], ['JAZZ'])
+
+  def test_show_start_time(self):
+    data, errors = RecordValidator(ShowForm).validate(
+      {'venue_id': 1, 'artist_id': 2, 'start_time': '2030-01-01 20:00:00'})
+    self.assertIsNone(errors)
+    self.assertEqual(data['start_time'], datetime(2030, 1, 1, 20))
+
+
+class StatementShapeTest(unittest.TestCase):
+
+  def test_parameters_and_literals_collapse(self):
+    self.assertEqual(
+      statement_shape("SELECT * FROM show WHERE venue_id = %(venue_id_1)s AND name = 'x'  LIMIT 10"),
+      'SELECT * FROM show WHERE venue_id = ? AND name = ? LIMIT ?')
+
+  def test_in_lists_collapse(self):
+    self.assertEqual(
+      statement_shape('SELECT * FROM venue WHERE id IN (%(id_1)s, %(id_2)s, %(id_3)s)'),
+      statement_shape('SELECT * FROM venue WHERE id IN (%(id_1)s, %(id_2)s)'))
+
+  def test_identifiers_with_digits_are_kept(self):
+    self.assertIn('venue_1', statement_shape('SELECT venue_1.id FROM venue AS venue_1'))
+
+
+if __name__ == '__main__':
+  unittest.main()
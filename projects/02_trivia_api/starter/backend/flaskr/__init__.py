@@ -1,26 +1,57 @@
 import os
-import random
 
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort, jsonify, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import func
 
 from models import setup_db, Question, Category
+from .profiler import SQLProfiler
+from .sampling import sampler
+from .categories import category_cache
+from .search import search_questions, decode_cursor
+from .quiz_sessions import QuizSessions, MemoryStore
 
 QUESTIONS_PER_PAGE = 10
 
-def paginate_questions(request, selection):
-  page = request.args.get('page', 1, type=int)
-  start = (page - 1) * QUESTIONS_PER_PAGE
-  end = start + QUESTIONS_PER_PAGE
-
-  questions = [question.format() for question in selection]
-  return questions[start:end]
+def paginate_questions(request, query):
+  '''
+  Loads one page of the questions matched by `query`, ordered by id,
+  and returns them formatted along with the cursor of the next page.
+  ?after=<id> pages by id (keyset), ?page=<n> with LIMIT/OFFSET; either
+  way only the rows of the page are fetched.
+  '''
+  after = request.args.get('after', None, type=int)
+  query = query.order_by(Question.id)
+  if after is not None:
+    query = query.filter(Question.id > after)
+  else:
+    page = request.args.get('page', 1, type=int)
+    query = query.offset(max(page - 1, 0) * QUESTIONS_PER_PAGE)
+
+  # one extra row tells whether there is a next page
+  rows = query.limit(QUESTIONS_PER_PAGE + 1).all()
+  next_cursor = rows[QUESTIONS_PER_PAGE - 1].id if len(rows) > QUESTIONS_PER_PAGE else None
+  return [question.format() for question in rows[:QUESTIONS_PER_PAGE]], next_cursor
+
+def count_questions(query):
+  # SELECT count(id) with the query's filters, without loading any rows
+  return query.with_entities(func.count(Question.id)).order_by(None).scalar()
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config:
+    app.config.update(test_config)
   db = setup_db(app)
+  SQLProfiler(app)
+  sampler.init_app(app)
+  # any store with set/pop_next/remaining/delete (see MemoryStore) can replace
+  # the in-process one
+  quiz_sessions = QuizSessions(app.config.get('QUIZ_SESSION_STORE') or MemoryStore(
+    max_entries=app.config.get('QUIZ_SESSION_MAX', 10000),
+    ttl=app.config.get('QUIZ_SESSION_TTL', 3600)
+  ))
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -44,12 +75,13 @@ def create_app(test_config=None):
   '''
   @app.route('/categories', methods=['GET'])
   def get_categories():
-    categories = {c.id: c.type for c in Category.query.all()}
+    # serialized once per change of the categories, not per request
+    body, etag = category_cache.get()
 
-    return jsonify({
-      'success': True, 
-      'categories': categories
-    })
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # revalidate, 304 if unchanged
+    return response.make_conditional(request)
   '''
   @TODO: 
   Create an endpoint to handle GET requests for questions, 
@@ -75,19 +107,20 @@ def create_app(test_config=None):
     category_id = request.args.get('category', None, type=int)
     
     if category_id:
-      selection = Question.query.filter(Question.category == category_id).all()
+      selection = Question.query.filter(Question.category == category_id)
     else:
-      selection = Question.query.all()
+      selection = Question.query
       
-    questions = paginate_questions(request, selection)
+    questions, next_cursor = paginate_questions(request, selection)
     
     if len(questions) == 0:
       abort(404)  #invalid page or no questions 
 
     return jsonify({
       'success': True,
-      'total_questions': len(selection),
-      'questions': questions
+      'total_questions': count_questions(selection),
+      'questions': questions,
+      'next_cursor': next_cursor
     })
 
   '''
@@ -147,14 +180,23 @@ def create_app(test_config=None):
     search_term = body.get('search', None)
     if not search_term:
       abort(422)
-  
-    selection = Question.query.filter(Question.question.ilike(f"%{search_term}%")).all()
-    questions = paginate_questions(request, selection)
+
+    try:
+      category_id = body.get('category', None)
+      category_id = int(category_id) if category_id else None
+      after = decode_cursor(body['after']) if body.get('after') else None
+    except (TypeError, ValueError):
+      abort(400)
+
+    # ranked full-text search over question and answer, cached per page
+    questions, total, next_cursor = search_questions(
+      search_term, category_id, after, QUESTIONS_PER_PAGE)
 
     return jsonify({
       'success': True, 
-      'total_questions': len(selection),
+      'total_questions': total,
       'questions': questions,
+      'next_cursor': next_cursor,
     })
 
 
@@ -193,24 +235,81 @@ def create_app(test_config=None):
   one question at a time is displayed, the user is allowed to answer
   and shown whether they were correct or not. 
   '''
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def start_quiz():
+    body = request.get_json()
+
+    quiz_category = body.get('quiz_category', None)
+    if not quiz_category:
+      abort(422)
+
+    # the deck is shuffled from the sampler's ids, no question rows are read
+    quiz_id, total = quiz_sessions.start(sampler.ids(quiz_category['id'] or None))
+
+    return jsonify({
+      'success': True,
+      'quiz_id': quiz_id,
+      'total_questions': total
+    })
+
+  @app.route('/quizzes/sessions/<quiz_id>', methods=['GET'])
+  def get_quiz(quiz_id):
+    try:
+      remaining = quiz_sessions.remaining(quiz_id)
+    except KeyError:
+      abort(404)  #unknown or expired quiz
+
+    return jsonify({
+      'success': True,
+      'quiz_id': quiz_id,
+      'remaining_questions': remaining
+    })
+
+  @app.route('/quizzes/sessions/<quiz_id>', methods=['DELETE'])
+  def end_quiz(quiz_id):
+    # one atomic delete that tells whether the quiz was there
+    if not quiz_sessions.end(quiz_id):
+      abort(404)  #unknown or expired quiz
+
+    return jsonify({
+      'success': True,
+      'deleted': quiz_id
+    })
+
   @app.route('/quizzes', methods=['POST'])
   def get_quiz_question():
     body = request.get_json()
 
+    quiz_id = body.get('quiz_id', None)
+    if quiz_id is not None:
+      try:
+        question = None
+        while question is None:
+          question_id = quiz_sessions.next(quiz_id)
+          if question_id is None:
+            break
+          question = Question.query.get(question_id)  # None if deleted since
+      except KeyError:
+        abort(404)  #unknown or expired quiz
+
+      return jsonify({
+        'success': True,
+        'quiz_id': quiz_id,
+        'question': question.format() if question else None
+      })
+
     previous_questions = body.get('previous_questions', [])
     quiz_category = body.get('quiz_category', None)
     if not quiz_category:
       abort(422)
 
+    # a random unseen id from the in-memory id arrays, then that one row
     category_id = quiz_category['id'] 
-    if category_id:
-      questions = Question.query.filter(Question.category == category_id, Question.id.notin_(previous_questions)).all()
-    else:
-      questions = Question.query.filter(Question.id.notin_(previous_questions)).all()
+    question = sampler.sample(category_id or None, previous_questions)
 
     return jsonify({
       'success': True,
-      'question': random.choice(questions).format() if len(questions) else None
+      'question': question.format() if question else None
     })
 
   '''
@@ -0,0 +1,66 @@
+import json
+import time
+import hashlib
+import threading
+
+from sqlalchemy import event
+
+from models import Category
+from .on_commit import on_commit, defer
+
+'''
+CategoryCache
+    the /categories response body, serialized once and kept with its
+    strong ETag until a category changes; also rebuilt every `ttl`
+    seconds to pick up other processes' writes
+'''
+class CategoryCache(object):
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self.loaded_at = None
+    self.body = None
+    self.etag = None
+    self._version = 0  # bumped by invalidate
+    self._lock = threading.Lock()
+
+  def load(self):
+    version = self._version
+    categories = {c.id: c.type for c in Category.query.order_by(Category.id)}
+    body = json.dumps({
+      'success': True,
+      'categories': categories
+    }, sort_keys=True).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    with self._lock:
+      self.body, self.etag = body, etag
+      # read before a commit that invalidated it meanwhile: serve it once,
+      # but load again on the next request
+      self.loaded_at = time.monotonic() if version == self._version else None
+
+  def get(self):
+    '''
+    returns (body, etag), loading them if invalidated or expired
+    '''
+    if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+      self.load()
+    with self._lock:
+      return self.body, self.etag
+
+  def invalidate(self):
+    with self._lock:
+      self._version += 1
+      self.loaded_at = None
+
+category_cache = CategoryCache()
+
+# invalidated once the change commits, see on_commit.py; invalidating at
+# flush would let a request rebuild the body from the uncommitted state
+@on_commit('categories')
+def _invalidate_categories(changes):
+  category_cache.invalidate()
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def _category_changed(mapper, connection, category):
+  defer(category, 'categories', category.id)
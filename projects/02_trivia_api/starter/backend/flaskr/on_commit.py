@@ -0,0 +1,37 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+'''
+on_commit(key)
+    registers the decorated function as the one applying the changes
+    queued under `key`; it is called with the list of changes once the
+    transaction they were queued in has committed
+'''
+_appliers = {}
+
+def on_commit(key):
+  def register(apply):
+    _appliers[key] = apply
+    return apply
+  return register
+
+'''
+defer(instance, key, change)
+    queues `change` under `key` until the transaction of the session that
+    `instance` belongs to ends. Mapper events fire at flush, before the
+    commit; in-memory state updated there would keep writes that are then
+    rolled back, and another request could rebuild it from the data as it
+    was before the commit.
+'''
+def defer(instance, key, change):
+  session = object_session(instance)
+  session.info.setdefault('on_commit', {}).setdefault(key, []).append(change)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+  for key, changes in session.info.pop('on_commit', {}).items():
+    _appliers[key](changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_changes(session):
+  session.info.pop('on_commit', None)
@@ -0,0 +1,98 @@
+import random
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+'''
+MemoryStore
+    bounded, expiring in-process store of quiz decks; the least recently
+    used deck is evicted once `max_entries` is reached, and decks not used
+    for `ttl` seconds are gone.
+    It is single-process only: every worker process has its own decks, so
+    with several workers a quiz must always reach the same one. Otherwise
+    use a shared store with the same methods (e.g. a Redis list per quiz,
+    RPUSH to set, LPOP to pop and DEL to delete), where pop_next and
+    delete are atomic across processes.
+'''
+class MemoryStore(object):
+  def __init__(self, max_entries=10000, ttl=3600):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def _deck(self, key):
+    # the live deck of `key`, refreshed as recently used; KeyError if unknown
+    entry = self._entries.get(key)
+    if entry is None or entry[0] < time.monotonic():
+      self._entries.pop(key, None)
+      raise KeyError(key)
+    self._entries[key] = (time.monotonic() + self.ttl, entry[1])
+    self._entries.move_to_end(key)
+    return entry[1]
+
+  def set(self, key, deck):
+    with self._lock:
+      self._entries[key] = (time.monotonic() + self.ttl, array('l', deck))
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def pop_next(self, key):
+    '''
+    atomically removes and returns the next id of the deck, None once it
+    is empty; raises KeyError for an unknown or expired deck
+    '''
+    with self._lock:
+      deck = self._deck(key)
+      return deck.pop() if deck else None
+
+  def remaining(self, key):
+    with self._lock:
+      return len(self._deck(key))
+
+  def delete(self, key):
+    '''
+    removes the deck; returns whether there was one (expired ones excepted)
+    '''
+    with self._lock:
+      entry = self._entries.pop(key, None)
+      return entry is not None and entry[0] >= time.monotonic()
+
+  def __len__(self):
+    return len(self._entries)
+
+'''
+QuizSessions
+    a quiz is a pre-shuffled deck of question ids kept in the store under
+    a random quiz id; every step pops the next id. Taking the next id is
+    the store's pop_next, so two concurrent steps of one quiz never get
+    the same question.
+'''
+class QuizSessions(object):
+  def __init__(self, store=None):
+    self.store = store if store is not None else MemoryStore()
+
+  def start(self, question_ids):
+    deck = list(question_ids)
+    random.shuffle(deck)
+    quiz_id = secrets.token_urlsafe(16)
+    self.store.set(quiz_id, deck)
+    return quiz_id, len(deck)
+
+  def next(self, quiz_id):
+    '''
+    returns the next question id of the quiz, None once the deck is empty;
+    raises KeyError for an unknown or expired quiz
+    '''
+    return self.store.pop_next(quiz_id)
+
+  def remaining(self, quiz_id):
+    # raises KeyError for an unknown or expired quiz
+    return self.store.remaining(quiz_id)
+
+  def end(self, quiz_id):
+    # False for an unknown or expired quiz
+    return self.store.delete(quiz_id)
@@ -0,0 +1,182 @@
+import random
+import signal
+import threading
+
+from sqlalchemy import event
+
+from models import db, Question
+from .on_commit import on_commit, defer
+
+def _key(category):
+  # ids are kept under the integer category id, all questions under None
+  return None if category is None else int(category)
+
+def _keys(category):
+  # a question without a category (deleted one) is only in the None array
+  return (None,) if category is None else (None, int(category))
+
+'''
+QuestionSampler
+    keeps the ids of every question in memory, per category, so a quiz
+    step can pick a random question without loading the category.
+    The arrays are built once, by the first quiz step or in the background
+    by init_app, and from then on kept up to date by the on-commit hooks
+    below; a full rebuild only runs on reload(), e.g. on SIGUSR1 after
+    another process wrote questions.
+'''
+class QuestionSampler(object):
+  # random picks tried before falling back to filtering the ids
+  ATTEMPTS = 8
+
+  def __init__(self):
+    self.loaded = False
+    self._ids = {}        # category -> [question id, ...]
+    self._positions = {}  # category -> {question id: index in _ids[category]}
+    self._pending = None  # changes applied while a rebuild runs
+    self._lock = threading.Lock()
+    self._load_lock = threading.Lock()
+
+  def init_app(self, app):
+    '''
+    starts the first load in the background and rebuilds on SIGUSR1
+    '''
+    if not self.loaded:
+      self.reload(app)
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+      signal.signal(signal.SIGUSR1, lambda signum, frame: self.reload(app))
+
+  def reload(self, app):
+    '''
+    rebuilds the id arrays on a background thread; requests keep using
+    the current arrays until the new ones are swapped in
+    '''
+    def run():
+      with app.app_context():
+        self.load()
+    threading.Thread(target=run, daemon=True).start()
+
+  def load(self, again=True):
+    '''
+    (re)builds the id arrays with one query over (id, category) and swaps
+    them in. Changes committed while the query runs may be missing from
+    its result; they are replayed on the new arrays before the swap.
+    '''
+    with self._load_lock:
+      if self.loaded and not again:
+        return
+      with self._lock:
+        self._pending = []
+      try:
+        ids, positions = {}, {}
+        for question_id, category in db.session.query(Question.id, Question.category):
+          for key in _keys(category):
+            positions.setdefault(key, {})[question_id] = len(ids.setdefault(key, []))
+            ids[key].append(question_id)
+        with self._lock:
+          self._ids, self._positions = ids, positions
+          for change, question_id, category in self._pending:
+            # add and remove are no-ops when already applied
+            (self._add if change == 'add' else self._remove)(question_id, category)
+          self.loaded = True
+      finally:
+        with self._lock:
+          self._pending = None
+
+  def add(self, question_id, category):
+    with self._lock:
+      self._add(question_id, category)
+      if self._pending is not None:
+        self._pending.append(('add', question_id, category))
+
+  def remove(self, question_id, category):
+    with self._lock:
+      self._remove(question_id, category)
+      if self._pending is not None:
+        self._pending.append(('remove', question_id, category))
+
+  def _add(self, question_id, category):
+    for key in _keys(category):
+      positions = self._positions.setdefault(key, {})
+      if question_id not in positions:
+        positions[question_id] = len(self._ids.setdefault(key, []))
+        self._ids[key].append(question_id)
+
+  def _remove(self, question_id, category):
+    # swap with the last id and pop, O(1)
+    for key in _keys(category):
+      positions = self._positions.get(key, {})
+      index = positions.pop(question_id, None)
+      if index is None:
+        continue
+      ids = self._ids[key]
+      last = ids.pop()
+      if last != question_id:
+        ids[index] = last
+        positions[last] = index
+
+  def _ensure_loaded(self):
+    # only until the first load; waits for a background one in progress
+    if not self.loaded:
+      self.load(again=False)
+
+  def ids(self, category=None):
+    '''
+    a copy of the question ids of the category (all categories if None)
+    '''
+    self._ensure_loaded()
+    with self._lock:
+      return list(self._ids.get(_key(category), []))
+
+  def pick(self, category=None, exclude=()):
+    '''
+    returns a random question id of the category (all categories if None)
+    that is not in `exclude`, or None if every question was excluded
+    '''
+    self._ensure_loaded()
+    key = _key(category)
+    exclude = set(exclude)
+    with self._lock:
+      ids = self._ids.get(key, [])
+      if len(exclude) < len(ids):
+        for _ in range(self.ATTEMPTS):
+          question_id = random.choice(ids)
+          if question_id not in exclude:
+            return question_id
+      # most of the category has been excluded already
+      remaining = [i for i in ids if i not in exclude]
+      return random.choice(remaining) if remaining else None
+
+  def sample(self, category=None, exclude=()):
+    '''
+    like pick, but loads and returns the Question itself (one row by id)
+    '''
+    exclude = set(exclude)
+    while True:
+      question_id = self.pick(category, exclude)
+      if question_id is None:
+        return None
+      question = Question.query.get(question_id)
+      if question is not None:
+        return question
+      # deleted by another process since the last load
+      self.remove(question_id, category)
+      exclude.add(question_id)
+
+sampler = QuestionSampler()
+
+# applied once the insert/delete commits, see on_commit.py
+@on_commit('sampler')
+def _apply_question_changes(changes):
+  for change, question_id, category in changes:
+    if change == 'add':
+      sampler.add(question_id, category)
+    else:
+      sampler.remove(question_id, category)
+
+@event.listens_for(Question, 'after_insert')
+def _add_question(mapper, connection, question):
+  defer(question, 'sampler', ('add', question.id, question.category))
+
+@event.listens_for(Question, 'after_delete')
+def _remove_question(mapper, connection, question):
+  defer(question, 'sampler', ('remove', question.id, question.category))
@@ -0,0 +1,151 @@
+import re
+import html
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, func, cast, and_, or_, REAL
+
+from models import db, Question, question_document, SEARCH_CONFIG
+from .on_commit import on_commit, defer
+
+# matches are marked with two control characters, removed from the text
+# beforehand; the rest is HTML-escaped and the marks become <mark> tags
+_START, _STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = 'StartSel={}, StopSel={}, HighlightAll=true'.format(_START, _STOP)
+
+_WORD = re.compile(r'\w+')
+
+def headline(column, query):
+  text = func.translate(func.coalesce(column, ''), _START + _STOP, '')
+  return func.ts_headline(SEARCH_CONFIG, text, query, HEADLINE_OPTIONS)
+
+def headline_html(headline):
+  '''
+  the ts_headline text, HTML-escaped, with its matches in <mark> tags;
+  safe to render as HTML although questions and answers are user input
+  '''
+  return html.escape(headline).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+def prefix_query(term):
+  '''
+  tsquery text matching questions that have every word of `term` as a
+  word prefix ("pen fle" -> "pen:* & fle:*"), None if there are no words
+  '''
+  words = _WORD.findall(term.lower())
+  return ' & '.join(word + ':*' for word in words) or None
+
+'''
+encode_cursor / decode_cursor
+    results are ordered by rank, then id; the cursor is the rank and id
+    of the last result of a page. decode_cursor raises ValueError.
+'''
+def encode_cursor(rank, question_id):
+  return '{!r}:{}'.format(rank, question_id)
+
+def decode_cursor(cursor):
+  rank, _, question_id = str(cursor).rpartition(':')
+  return float(rank), int(question_id)
+
+'''
+SearchCache
+    small LRU of search result pages, cleared once an insert, update or
+    delete of a question commits; a page computed before a clear (from
+    the data as it was before that commit) is not stored
+'''
+class SearchCache(object):
+  def __init__(self, max_entries=256):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self.version = 0  # bumped by clear
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      value = self._entries.get(key)
+      if value is not None:
+        self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, version):
+    with self._lock:
+      if version != self.version:
+        return
+      self._entries[key] = value
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self.version += 1
+      self._entries.clear()
+
+search_cache = SearchCache()
+
+def search_questions(term, category=None, after=None, limit=10):
+  '''
+  Full-text search over question and answer text, through the GIN index
+  on `question_document`. Returns the page of questions after the
+  decoded cursor `after`, best ranked first, each formatted with its
+  `rank` and a `highlight` of both texts; the number of matches; and
+  the cursor of the next page (None on the last one).
+  '''
+  text = prefix_query(term)
+  if text is None:
+    return [], 0, None
+
+  key = (text, category, after, limit)
+  cached = search_cache.get(key)
+  if cached is not None:
+    return cached
+  version = search_cache.version
+
+  query = func.to_tsquery(SEARCH_CONFIG, text)
+  rank = func.ts_rank(question_document, query)
+  selection = Question.query.filter(question_document.op('@@')(query))
+  if category is not None:
+    selection = selection.filter(Question.category == category)
+  total = selection.with_entities(func.count(Question.id)).scalar()
+
+  if after is not None:
+    # ts_rank is a real; compare as one so the cursor's rank matches exactly
+    after_rank, after_id = cast(after[0], REAL), after[1]
+    selection = selection.filter(or_(
+      rank < after_rank,
+      and_(rank == after_rank, Question.id > after_id)
+    ))
+  # headlines are only computed for the rows of the page
+  rows = selection.with_entities(
+    Question,
+    rank,
+    headline(Question.question, query),
+    headline(Question.answer, query)
+  ).order_by(rank.desc(), Question.id).limit(limit + 1).all()
+
+  questions = []
+  for question, question_rank, question_headline, answer_headline in rows[:limit]:
+    formatted = question.format()
+    formatted['rank'] = question_rank
+    formatted['highlight'] = {
+      'question': headline_html(question_headline),
+      'answer': headline_html(answer_headline)
+    }
+    questions.append(formatted)
+  next_cursor = None
+  if len(rows) > limit:
+    last = rows[limit - 1]
+    next_cursor = encode_cursor(last[1], last[0].id)
+
+  result = (questions, total, next_cursor)
+  search_cache.set(key, result, version)
+  return result
+
+# cleared once the change commits, see on_commit.py
+@on_commit('search')
+def _clear_search_cache(changes):
+  search_cache.clear()
+
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+def _question_changed(mapper, connection, question):
+  defer(question, 'search', question.id)
@@ -0,0 +1,31 @@
+-- questions.category as an indexed integer foreign key to categories.id.
+--
+-- Databases created by an older `db.create_all()` have a varchar category
+-- column without constraint or index; ones restored from trivia.psql
+-- have the integer column and foreign key but no index. Both end up the
+-- same. Safe to run more than once:
+--
+--     psql trivia < migrations/001_question_category_fk.sql
+
+BEGIN;
+
+-- backfill: categories that are not the id of an existing category are cleared
+UPDATE questions SET category = NULL
+WHERE category IS NOT NULL
+  AND CASE WHEN category::text ~ '^\s*\d{1,9}\s*$'
+           THEN trim(category::text)::integer NOT IN (SELECT id FROM categories)
+           ELSE true
+      END;
+
+ALTER TABLE questions
+    ALTER COLUMN category TYPE integer USING trim(category::text)::integer;
+
+ALTER TABLE questions DROP CONSTRAINT IF EXISTS category;
+ALTER TABLE questions DROP CONSTRAINT IF EXISTS questions_category_fkey;
+ALTER TABLE questions
+    ADD CONSTRAINT questions_category_fkey FOREIGN KEY (category)
+    REFERENCES categories (id) ON UPDATE CASCADE ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category ON questions (category);
+
+COMMIT;
@@ -0,0 +1,10 @@
+-- GIN index for the full-text search of questions and answers.
+--
+-- The expression must stay identical to models.question_document, or
+-- searches won't use the index. Safe to run more than once:
+--
+--     psql trivia < migrations/002_question_search_index.sql
+
+CREATE INDEX IF NOT EXISTS ix_questions_document ON questions USING gin (
+    to_tsvector('simple'::regconfig, (coalesce(question, '') || ' ') || coalesce(answer, ''))
+);
@@ -1,7 +1,7 @@
 import os
 import json
 
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine, func, literal_column
 from flask_sqlalchemy import SQLAlchemy
 
 DB_HOST = os.getenv('DB_HOST', '127.0.0.1:5432')
@@ -34,13 +34,13 @@ class Question(db.Model):
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'), index=True)
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
     self.question = question
     self.answer = answer
-    self.category = category
+    self.category = int(category) if category is not None else None
     self.difficulty = difficulty
 
   def insert(self):
@@ -63,6 +63,25 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+question_document
+    the full-text search document of a question, its question and answer
+    text; the GIN index is on this exact expression, so queries must use
+    it (not an equivalent one) for the index to apply
+'''
+SEARCH_CONFIG = literal_column("'simple'::regconfig")  # no stemming, no stop words
+
+def _text(column):
+  return func.coalesce(column, literal_column("''"))
+
+question_document = func.to_tsvector(
+  SEARCH_CONFIG,
+  _text(Question.question).op('||')(literal_column("' '")).op('||')(_text(Question.answer))
+)
+Question.__table__.append_constraint(
+  Index('ix_questions_document', question_document, postgresql_using='gin')
+)
+
 '''
 Category
 
@@ -1,10 +1,15 @@
 import os
 import unittest
 import json
+import threading
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 from flaskr import create_app, QUESTIONS_PER_PAGE
-from models import setup_db, Question, Category
+from flaskr.search import encode_cursor, search_cache
+from flaskr.sampling import sampler
+from flaskr.quiz_sessions import MemoryStore
+from models import setup_db, db, Question, Category
 
 
 DB_HOST = os.getenv('TEST_DB_HOST', '127.0.0.1:5432')
@@ -54,6 +59,37 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(len(data['categories']), len(categories))
 
+    def test_get_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+        category = Category(type='Music')
+        db.session.add(category)
+        db.session.commit()
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertEqual(data['categories'][str(category.id)], 'Music')
+
+        db.session.delete(category)
+        db.session.commit()
+
+    def test_get_categories_ignores_rolled_back_writes(self):
+        etag = self.client().get('/categories').headers['ETag']
+
+        db.session.add(Category(type='Music'))
+        db.session.flush()
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        db.session.rollback()
+        self.assertEqual(res.status_code, 304)
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
 
     def test_get_paginated_questions(self):
 
@@ -80,7 +116,25 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
 
         self.assertTrue(len(data['questions']) <= QUESTIONS_PER_PAGE)
-        self.assertEqual(data['total_questions'], len(questions)) 
+        self.assertEqual(data['total_questions'], len(questions))
+
+    def test_get_questions_after_cursor(self):
+        res = self.client().get('/questions')
+        first_page = json.loads(res.data)
+        cursor = first_page['next_cursor']
+        self.assertIsNotNone(cursor)
+
+        res = self.client().get(f'/questions?after={cursor}')
+        data = json.loads(res.data)
+
+        ids = [q['id'] for q in data['questions']]
+        expected = [q.id for q in Question.query.filter(Question.id > cursor).order_by(Question.id).limit(QUESTIONS_PER_PAGE)]
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(ids, expected)
+        self.assertEqual(data['total_questions'], first_page['total_questions'])
+
+        res = self.client().get('/questions?page=2')
+        self.assertEqual([q['id'] for q in json.loads(res.data)['questions']], ids)
 
     def test_404_get_questions_beyond_valid_page(self):
         res = self.client().get('/questions?page=1000')
@@ -129,6 +183,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['message'], 'unprocessable')
         self.assertEqual(count_before, count_after)
 
+    def test_422_create_new_question_unknown_category(self):
+        count_before = Question.query.count()
+        res = self.client().post('/questions', json=dict(self.new_question, category=1000))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(Question.query.count(), count_before)
+
     def test_delete_question(self):
         question_id = 5
         res = self.client().delete(f'/questions/{question_id}')
@@ -152,6 +215,65 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_questions']) 
         self.assertEqual(len(data['questions']), num_results) 
  
+    def test_search_matches_answers_by_prefix_with_highlights(self):
+        res = self.client().post('/questions/search', json={'search': 'flem'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([q['id'] for q in data['questions']], [21])
+        self.assertEqual(data['questions'][0]['highlight']['answer'], 'Alexander <mark>Fleming</mark>')
+
+    def test_search_highlight_is_escaped(self):
+        question = Question(question='<img src=x onerror=alert(1)> Xylophone?', answer='\x02<b>\x03',
+                            category=1, difficulty=1)
+        question.insert()
+        try:
+            res = self.client().post('/questions/search', json={'search': 'xylo'})
+            highlight = json.loads(res.data)['questions'][0]['highlight']
+        finally:
+            question.delete()
+
+        self.assertEqual(highlight['question'], '&lt;img src=x onerror=alert(1)&gt; <mark>Xylophone</mark>?')
+        self.assertEqual(highlight['answer'], '&lt;b&gt;')
+
+    def test_search_within_category_by_cursor(self):
+        res = self.client().post('/questions/search', json={'search': 'which', 'category': 6})
+        data = json.loads(res.data)
+        self.assertEqual(sorted(q['id'] for q in data['questions']), [10, 11])
+
+        res = self.client().post('/questions/search', json={'search': 'which'})
+        everything = json.loads(res.data)['questions']
+        cursor = encode_cursor(everything[2]['rank'], everything[2]['id'])
+
+        res = self.client().post('/questions/search', json={'search': 'which', 'after': cursor})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([q['id'] for q in data['questions']], [q['id'] for q in everything[3:]])
+
+        res = self.client().post('/questions/search', json={'search': 'which', 'after': 'nonsense'})
+        self.assertEqual(res.status_code, 400)
+
+    def test_search_sees_new_questions(self):
+        res = self.client().post('/questions/search', json={'search': 'okapi'})
+        self.assertEqual(json.loads(res.data)['total_questions'], 0)
+
+        question = Question(question='Which animal is the closest relative of the giraffe?', answer='Okapi', category=1, difficulty=2)
+        question.insert()
+        res = self.client().post('/questions/search', json={'search': 'okapi'})
+        self.assertEqual([q['id'] for q in json.loads(res.data)['questions']], [question.id])
+
+        question.delete()
+
+    def test_search_ignores_rolled_back_writes(self):
+        search_cache.clear()
+        self.client().post('/questions/search', json={'search': 'okapi'})
+        self.assertEqual(len(search_cache._entries), 1)
+
+        db.session.add(Question(question='Rolled back?', answer='Okapi', category=1, difficulty=2))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(len(search_cache._entries), 1)
+
     def test_get_question_search_without_results(self):
         search_term = 'bitcoin'
         res = self.client().post('/questions/search', json={'search': search_term})
@@ -205,6 +327,128 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['question'], None)
 
+    def test_get_quiz_question_sees_new_and_deleted_questions(self):
+        req_body = {
+            'previous_questions': [13, 14, 15],
+            'quiz_category': {
+                'type': 'Geography',
+                'id': 3
+            }
+        }
+        self.client().post('/quizzes', json=req_body)  # loads the sampler
+        question = Question(question='Which river flows through Cairo?', answer='Nile', category=3, difficulty=1)
+        question.insert()
+
+        data = json.loads(self.client().post('/quizzes', json=req_body).data)
+        self.assertEqual(data['question']['id'], question.id)
+
+        question.delete()
+        data = json.loads(self.client().post('/quizzes', json=req_body).data)
+        self.assertEqual(data['question'], None)
+
+    def test_quiz_sampler_ignores_rolled_back_writes(self):
+        sampler.load()
+        question = Question.query.get(13)
+        db.session.delete(question)
+        db.session.flush()
+        db.session.rollback()
+        self.assertIn(13, sampler.ids(3))
+
+        db.session.add(Question(question='Rolled back?', answer='Yes', category=3, difficulty=1))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(sorted(sampler.ids(3)), [13, 14, 15])
+
+    def test_quiz_sampler_reload_keeps_changes_committed_meanwhile(self):
+        sampler.load()
+        engine = db.get_engine()
+        committed = []
+
+        # a commit landing while the rebuild query runs, after its snapshot
+        def concurrent_commit(conn, cursor, statement, parameters, context, executemany):
+            if not committed:
+                committed.append(True)
+                sampler.add(1000000, 3)
+                sampler.remove(13, 3)
+        event.listen(engine, 'after_cursor_execute', concurrent_commit)
+        try:
+            sampler.load()
+        finally:
+            event.remove(engine, 'after_cursor_execute', concurrent_commit)
+
+        self.assertEqual(sorted(sampler.ids(3)), [14, 15, 1000000])
+        sampler.load()
+        self.assertEqual(sorted(sampler.ids(3)), [13, 14, 15])
+
+    def test_quiz_session_deals_each_question_once(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Geography', 'id': 3}})
+        data = json.loads(res.data)
+        quiz_id = data['quiz_id']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], Question.query.filter(Question.category == 3).count())
+
+        dealt = []
+        for _ in range(data['total_questions']):
+            res = self.client().post('/quizzes', json={'quiz_id': quiz_id})
+            dealt.append(json.loads(res.data)['question']['id'])
+        self.assertEqual(sorted(dealt), [13, 14, 15])
+
+        res = self.client().post('/quizzes', json={'quiz_id': quiz_id})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)['question'], None)
+
+    def test_quiz_session_remaining_and_end(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Geography', 'id': 3}})
+        quiz_id = json.loads(res.data)['quiz_id']
+        self.client().post('/quizzes', json={'quiz_id': quiz_id})
+
+        res = self.client().get('/quizzes/sessions/' + quiz_id)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['remaining_questions'], 2)
+
+        res = self.client().delete('/quizzes/sessions/' + quiz_id)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], quiz_id)
+
+        self.assertEqual(self.client().get('/quizzes/sessions/' + quiz_id).status_code, 404)
+        self.assertEqual(self.client().delete('/quizzes/sessions/' + quiz_id).status_code, 404)
+        self.assertEqual(self.client().post('/quizzes', json={'quiz_id': quiz_id}).status_code, 404)
+
+    def test_quiz_session_store_pops_atomically(self):
+        store = MemoryStore()
+        store.set('quiz', range(1000))
+        dealt = []
+        def deal():
+            while True:
+                question_id = store.pop_next('quiz')
+                if question_id is None:
+                    return
+                dealt.append(question_id)
+        threads = [threading.Thread(target=deal) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(dealt), list(range(1000)))
+
+        ended = []
+        threads = [threading.Thread(target=lambda: ended.append(store.delete('quiz'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(ended), [False] * 7 + [True])
+
+    def test_404_quiz_session_unknown(self):
+        res = self.client().post('/quizzes', json={'quiz_id': 'no-such-quiz'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
     def test_422_get_quiz_no_category(self):
         req_body = {
             'previous_questions': [13, 14, 15], 
@@ -216,6 +460,31 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'unprocessable')
 
+    def test_sql_profiler_reports_queries(self):
+        app = create_app({'SQL_PROFILER': True, 'DEBUG': True})
+        setup_db(app, DB_PATH)
+        client = app.test_client()
+
+        # requests are recorded once the response is closed
+        res = client.get('/questions', buffered=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(int(res.headers['X-SQL-Queries']) >= 1)
+        self.assertIn('X-SQL-Time-Ms', res.headers)
+
+        res = client.get('/_profiler/sql')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['routes']['GET /questions']['requests'], 1)
+
+    def test_sql_profiler_summary_needs_debug_or_flag(self):
+        app = create_app({'SQL_PROFILER': True})
+        setup_db(app, DB_PATH)
+        self.assertEqual(app.test_client().get('/_profiler/sql').status_code, 404)
+
+        app = create_app({'SQL_PROFILER': True, 'SQL_PROFILER_ENDPOINT': True})
+        setup_db(app, DB_PATH)
+        self.assertEqual(app.test_client().get('/_profiler/sql').status_code, 200)
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
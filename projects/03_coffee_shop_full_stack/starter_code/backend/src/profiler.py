@@ -0,0 +1,152 @@
+import os
+import re
+import time
+import threading
+from collections import Counter, defaultdict
+
+from flask import g, request, jsonify, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+## Statement shapes
+
+# Each project of this repository is installed and run on its own, so every
+# app has its own copy of this module. Keep the copies in step.
+_PARAM = re.compile(r"%\([^)]*\)s|\?|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACE = re.compile(r"\s+")
+
+'''
+statement_shape(statement)
+    the statement with literals, bound parameters and IN lists collapsed
+    to `?`; two statements with the same shape differ only in their
+    parameters, which is what an N+1 loop looks like
+'''
+def statement_shape(statement):
+    shape = _PARAM.sub('?', statement)
+    shape = _LIST.sub('(?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+## SQL profiler
+
+'''
+SQLProfiler
+    opt-in (SQL_PROFILER) per-request SQL statistics and N+1 detection;
+    statements are counted and timed through SQLAlchemy engine events,
+    streamed bodies included, and a statement shape repeated at least
+    SQL_PROFILER_N_PLUS_ONE times in one request is reported as an N+1.
+    Requests are aggregated per route once their response is closed. The
+    summary lists SQL, so it is only served at SQL_PROFILER_URL (default
+    /_profiler/sql) in debug mode or with SQL_PROFILER_ENDPOINT set; debug
+    responses also get X-SQL-* headers, which for a streamed body only
+    count the statements run before it
+'''
+class SQLProfiler(object):
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 10
+        self._routes = defaultdict(lambda: {
+            'requests': 0,
+            'queries': 0,
+            'db_time_ms': 0.0,
+            'max_queries': 0,
+            'n_plus_one_requests': 0,
+            'n_plus_one': Counter(),
+        })
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_PROFILER', os.getenv('SQL_PROFILER', '') == '1')
+        if not self.enabled:
+            return
+        self.threshold = app.config.get('SQL_PROFILER_N_PLUS_ONE', 10)
+
+        # listening on the Engine class covers engines created after init_app
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if app.debug or app.config.get('SQL_PROFILER_ENDPOINT', False):
+            app.add_url_rule(app.config.get('SQL_PROFILER_URL', '/_profiler/sql'),
+                             'sql_profiler_summary', self.summary_view)
+
+    def _start(self):
+        g.sql_profile = {'queries': 0, 'time': 0.0, 'shapes': Counter()}
+
+    def _repeated(self, profile):
+        return [(shape, n) for shape, n in profile['shapes'].items() if n >= self.threshold]
+
+    def _finish(self, response):
+        profile = g.get('sql_profile')
+        if profile is None or request.endpoint == 'sql_profiler_summary':
+            return response
+
+        if current_app.debug:
+            response.headers['X-SQL-Queries'] = str(profile['queries'])
+            response.headers['X-SQL-Time-Ms'] = '{:.2f}'.format(profile['time'] * 1000)
+            repeated = self._repeated(profile)
+            if repeated:
+                shape, n = max(repeated, key=lambda r: r[1])
+                response.headers['X-SQL-N-Plus-One'] = '{}x {}'.format(n, shape[:200])
+
+        # a streamed body is generated after this; record once it has been sent
+        route = '{} {}'.format(request.method, request.url_rule.rule if request.url_rule else '<unmatched>')
+        response.call_on_close(lambda: self._record(route, profile))
+        return response
+
+    def _record(self, route, profile):
+        repeated = self._repeated(profile)
+        with self._lock:
+            stats = self._routes[route]
+            stats['requests'] += 1
+            stats['queries'] += profile['queries']
+            stats['db_time_ms'] += profile['time'] * 1000
+            stats['max_queries'] = max(stats['max_queries'], profile['queries'])
+            if repeated:
+                stats['n_plus_one_requests'] += 1
+                for shape, n in repeated:
+                    stats['n_plus_one'][shape] = max(stats['n_plus_one'][shape], n)
+
+    def summary(self):
+        with self._lock:
+            return {
+                route: {
+                    'requests': s['requests'],
+                    'avg_queries': s['queries'] / s['requests'],
+                    'max_queries': s['max_queries'],
+                    'avg_db_time_ms': s['db_time_ms'] / s['requests'],
+                    'n_plus_one_requests': s['n_plus_one_requests'],
+                    'n_plus_one': [
+                        {'statement': shape, 'max_repeats': n}
+                        for shape, n in s['n_plus_one'].most_common(5)
+                    ],
+                }
+                for route, s in self._routes.items()
+            }
+
+    def summary_view(self):
+        return jsonify({
+            'success': True,
+            'routes': self.summary()
+        })
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # the start goes with the statement's execution context; a per-connection
+    # stack would keep the start of a failed statement and pair it with the next
+    if context is not None and has_request_context() and 'sql_profile' in g:
+        context._sql_profiler_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_sql_profiler_start', None)
+    if start is None or not has_request_context() or 'sql_profile' not in g:
+        return
+    profile = g.sql_profile
+    profile['queries'] += 1
+    profile['time'] += time.perf_counter() - start
+    profile['shapes'][statement_shape(statement)] += 1
@@ -8,11 +8,13 @@ from flask_cors import CORS
 
 from models import setup_db, User, Organisation, Event
 from auth import AuthError, requires_auth
+from profiler import SQLProfiler
 
 
 app = Flask(__name__)
 db = setup_db(app)
 CORS(app) 
+SQLProfiler(app)
 
 
 #----------------------------------------------------------------------------#